@@ -4,14 +4,21 @@ import tkinter as tk
 
 
 def main() -> None:
-    """Main function to start the Object Pattern Recognizer GUI."""
+    """Main function to start the Object Pattern Recognizer GUI.
+    
+    Start with --startup-report to print times of startup steps.
+    """
     # Adjust the path to include the src directory
     src_path = os.path.join(os.path.dirname(__file__), "src")
     sys.path.insert(0, os.path.abspath(src_path))
     
+    from startup_report import StartupReport
+    StartupReport.start("--startup-report" in sys.argv[1:])
     from gui import ObjectPatternRecognizerGUI
+    StartupReport.mark("import gui")
     root = tk.Tk()
     app = ObjectPatternRecognizerGUI(root)
+    StartupReport.mark("create window")
     root.mainloop()
 
 
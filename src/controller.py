@@ -1,12 +1,46 @@
 """Module for managing object detection in camera and image streams."""
 
+import os
 import threading
+from datetime import datetime
 from typing import Any, Callable, Optional, List
 
 from data_selector import DataSelector
+from data_streams import DataStream
 from logger import Logger
-from modificators_image import PictureModifications
-from detection_shape import Detection
+from detection_shape import DetectedShape
+from detection_backends import BackendRegistry, DetectorBackend
+from detection_cache import DetectionCache
+from detection_change import ChangeDetector
+from detection_statistics import DetectionStatistics
+from modificators_image import AnnotationRenderer
+from handling_export import ImageExporter, VideoRecorder
+from handling_configurations import ConfigReader
+from handling_paths_files import PathHandling
+from pipeline import Pipeline, POLICY_BLOCK
+
+
+class FrameTask:
+    """Data of one frame passed through the detection pipeline."""
+    def __init__(self, frame_count: int, image_name: str, mode: str) -> None:
+        """Initialize frame task.
+
+        Args:
+            frame_count (int): Frame number.
+            image_name (str): Name of image or frame.
+            mode (str): Detection mode ("CAMERA" or "IMAGE").
+        """
+        self.frame_count = frame_count
+        self.image_name = image_name
+        self.mode = mode
+        self.path = "" # image file, if any
+        self.img: Any = None
+        self.recognized: List[DetectedShape] = []
+        self.logged: List[DetectedShape] = []
+        self.cache_key = ""
+        self.cached = False
+        self.detected = False
+        self.annotated = False
 
 
 class DetectionController:
@@ -26,6 +60,18 @@ class DetectionController:
         stop_event: Threading event to signal detection stopping.
         logger: Logger instance for recording detection results.
         data_selector: Selector for managing different input streams.
+        detector: Detection backend of the current stream, configured per
+            stream type in config.
+        detection_cache: Cache of detection results for image files, or None.
+        change_detector: Detector skipping unchanged camera frames, or None.
+        statistics: Live counts of logged shapes of the current run, or None.
+        log_rows: Boolean indicating if every shape is logged as CSV row.
+        exporter: Writer of annotated images of the current run to the output
+            folder, or None.
+        recorder: Writer of annotated video of the current CAMERA run, or None.
+        headless: Boolean indicating if annotation and display are skipped.
+        annotation_max_size: Maximum image side of annotated images, 0 for
+            full resolution.
     """
 
     def __init__(
@@ -45,8 +91,8 @@ class DetectionController:
             show_image_callback: Function to display processed images.
             update_status_callback: Function to update status messages.
             log_file_path: Path to CSV log file. Defaults to 'log.csv'.
-            source_type: Type of data source ("c" for camera, "i" for images).
-                Defaults to "c".
+            source_type: Unused, the data source is selected by mode on
+                start of detection. Defaults to "c".
         """
         self.mode = mode
         self.image_path = image_path
@@ -55,14 +101,29 @@ class DetectionController:
         self.running = False
         self.detection_thread: Optional[threading.Thread] = None
         self.stop_event = threading.Event()
-        self.logger = Logger(base_file_path=log_file_path)
-        self.data_selector = None
-        
-        # Initialize data selector
-        self._initialize_data_selector(
-            source_type,
-            self.image_path.get() if self.mode.get().upper() == "IMAGE" else ""
+        config_reader = ConfigReader("config.json")
+        self.logger = Logger(
+            base_file_path=log_file_path,
+            max_segment_mb=float(config_reader.get_value('log_max_segment_mb', 0)),
+            max_segment_seconds=float(config_reader.get_value('log_max_segment_seconds', 0)),
+            compress=bool(config_reader.get_value('log_compress', True)),
+            max_total_mb=float(config_reader.get_value('log_max_total_mb', 0))
         )
+        self.data_selector: Optional[DataSelector] = None # created on first start
+        self.detection_cache: Optional[DetectionCache] = None
+        self._parameter_hash = ""
+        self._initialize_detection_cache()
+        self.detector: DetectorBackend = None
+        self._initialize_detector(self.mode.get().upper())
+        self.change_detector: Optional[ChangeDetector] = None
+        self._last_frame_result: Optional[List[DetectedShape]] = None
+        self._initialize_change_detector()
+        self.headless = bool(config_reader.get_value('headless', False))
+        self.annotation_max_size = config_reader.get_int('annotation_max_size', 0)
+        self.log_rows = bool(config_reader.get_value('log_rows', True))
+        self.statistics: Optional[DetectionStatistics] = None
+        self.exporter: Optional[ImageExporter] = None
+        self.recorder: Optional[VideoRecorder] = None
 
     def get_image_names(self) -> List[str]:
         """Get names of all available images in the current stream.
@@ -94,15 +155,131 @@ class DetectionController:
             print(f"Error initializing DataSelector: {e}")
             self.update_status_callback(f"Error initializing data source: {e}")
 
+    def _initialize_detection_cache(self) -> None:
+        """Initialize the detection result cache, if enabled in config."""
+        config_reader = ConfigReader("config.json")
+        if not config_reader.get_value('detection_cache', False):
+            return
+        
+        path_cache = os.path.join(PathHandling().get_path_abs_output(), "cache")
+        self.detection_cache = DetectionCache(
+            path_cache,
+            float(config_reader.get_value('detection_cache_max_mb', 256)),
+            bool(config_reader.get_value('detection_cache_thumbnails', True)),
+            config_reader.get_int('detection_cache_thumbnail_size', 640)
+        )
+
+    def _initialize_detector(self, mode: str) -> None:
+        """Initialize the detection backend configured for the stream type
+        of mode. Cached results are only valid for the same backend and 
+        parameters.
+
+        Args:
+            mode (str): Current detection mode.
+        """
+        self.detector = BackendRegistry.create_for_stream(
+            "camera" if mode == "CAMERA" else "image")
+        if self.detection_cache:
+            parameters = self.detector.get_parameters()
+            parameters['detection_resolution'] = ConfigReader("config.json").get_int(
+                'detection_resolution', 0)
+            self._parameter_hash = DetectionCache.get_parameter_hash(parameters)
+
+    def _initialize_change_detector(self) -> None:
+        """Initialize change gating for CAMERA mode, if enabled in config."""
+        config_reader = ConfigReader("config.json")
+        if not config_reader.get_value('change_gating', False):
+            return
+        self.change_detector = ChangeDetector(
+            float(config_reader.get_value('change_threshold', 0.002)))
+
+    def _initialize_statistics(self) -> None:
+        """Initialize live statistics of this run, if enabled in config.
+        The summary file is stored next to the CSV log."""
+        config_reader = ConfigReader("config.json")
+        if not config_reader.get_value('statistics', False):
+            self.statistics = None
+            return
+        path_summary = os.path.splitext(self.logger.file_path)[0] + "_summary.jsonl"
+        self.statistics = DetectionStatistics(
+            config_reader.get_value('statistics_windows', [60, 600]),
+            path_summary,
+            float(config_reader.get_value('statistics_flush_interval', 60))
+        )
+
+    def _initialize_exporter(self, mode: str) -> None:
+        """Initialize export of annotated images of this run, if enabled in
+        config. Images are written to a new folder in out/annotated/.
+
+        Args:
+            mode (str): Current detection mode.
+        """
+        config_reader = ConfigReader("config.json")
+        if not config_reader.get_value('export', False):
+            self.exporter = None
+            return
+        path_export = os.path.join(PathHandling().get_path_abs_output(), "annotated",
+                                   datetime.now().strftime('%Y%m%d_%H%M%S'))
+        config_stage = config_reader.get_value('pipeline_stages', {}).get('export', {})
+        policy = config_stage.get('policy', POLICY_BLOCK)
+        self.exporter = ImageExporter(
+            path_export,
+            config_reader.get_value('export_format', ".jpg"),
+            config_reader.get_int('export_jpeg_quality', 90),
+            config_reader.get_int('export_png_compression', 3),
+            config_reader.get_int('export_max_size', 0),
+            int(config_stage.get('workers', 2)),
+            int(config_stage.get('queue_size', 8)),
+            policy if mode == "CAMERA" else POLICY_BLOCK
+        )
+
+    def _initialize_recorder(self, mode: str) -> None:
+        """Initialize video recording of this CAMERA run, if enabled in config.
+        The video is written to out/recordings/.
+
+        Args:
+            mode (str): Current detection mode.
+        """
+        config_reader = ConfigReader("config.json")
+        if mode != "CAMERA" or not config_reader.get_value('record_video', False):
+            self.recorder = None
+            return
+        path_video = os.path.join(PathHandling().get_path_abs_output(), "recordings",
+                                  f"camera_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        self.recorder = VideoRecorder(
+            path_video,
+            config_reader.get_value('record_codec', "mp4v"),
+            float(config_reader.get_value('record_fps', 15)),
+            float(config_reader.get_value('record_scale', 1.0)),
+            config_reader.get_int('record_queue_size', 16)
+        )
+
+    def get_statistics_text(self) -> str:
+        """Get live statistics of the current run.
+
+        Returns:
+            str: Counts per window, empty if statistics are disabled.
+        """
+        if self.statistics is None:
+            return ""
+        return self.statistics.get_summary_text()
+
     def start_detection(self) -> None:
         """Start object detection in a separate thread."""
         if self.running:
             return
+        if self.change_detector:
+            self.change_detector.reset()
+        self._last_frame_result = None
+        self._initialize_statistics()
 
         current_mode = self.mode.get().upper()
+        self._initialize_detector(current_mode)
         if current_mode in ["CAMERA", "IMAGE"]:
             if not self._setup_stream(current_mode):
                 return
+            self._initialize_exporter(current_mode)
+            self._initialize_recorder(current_mode)
 
         self.running = True
         self.stop_event.clear()
@@ -126,10 +303,16 @@ class DetectionController:
             folder_path = self.image_path.get() if mode == "IMAGE" else ""
             source_type = "i" if mode == "IMAGE" else "c"
             
-            if not self.data_selector.select_stream(
-                source_type=source_type,
-                folder_path=folder_path
-            ):
+            if self.data_selector is None:
+                self._initialize_data_selector(source_type, folder_path)
+                selected = (self.data_selector is not None and 
+                            self.data_selector.get_stream() is not None)
+            else:
+                selected = self.data_selector.select_stream(
+                    source_type=source_type,
+                    folder_path=folder_path
+                )
+            if not selected:
                 self.update_status_callback("Status: Failed to initialize source.")
                 return False
 
@@ -154,10 +337,13 @@ class DetectionController:
             self.stop_event.set()
             self.update_status_callback("Status: Stopping detection...")
             
+            stream = self.data_selector.get_stream()
+            if stream:
+                stream.interrupt_data_stream()
+            
             if self.detection_thread and self.detection_thread.is_alive():
                 self.detection_thread.join(timeout=2.0)
             
-            stream = self.data_selector.get_stream()
             if stream:
                 try:
                     stream.close_data_stream()
@@ -198,22 +384,36 @@ class DetectionController:
     def detect_from_stream(self, mode: str) -> None:
         """Process images from the data stream and perform object detection.
 
+        Frames are captured in this thread and passed through the pipeline
+        stages detect, annotate, log and display, which run concurrently.
+
         Args:
             mode (str): Current detection mode ("CAMERA" or "IMAGE").
         """
         self.update_status_callback(f"Status: {mode} detection started.")
         frame_count = 0
         stream = self.data_selector.get_stream()
+        pipeline = self._create_pipeline(mode)
+        pipeline.start()
+        if self.exporter:
+            self.exporter.start()
+        if self.recorder:
+            self.recorder.start()
+        
+        # streams may open without image, e.g. watched folder still empty
+        if stream and not stream.has_current_image():
+            stream.update_data_stream()
         
         while self.running and not self.stop_event.is_set() and stream:
             try:
-                img = stream.get_current_image()
-                if img is None:
+                if not stream.has_current_image():
                     print("No image received from stream")
                     break
 
                 frame_count += 1
-                self._process_frame(img, frame_count, mode)
+                task = self._capture_frame(stream, frame_count, mode)
+                if task is not None:
+                    pipeline.put(task)
 
                 if not stream.update_data_stream():
                     print("Failed to update data stream")
@@ -223,51 +423,234 @@ class DetectionController:
                 print(f"Error processing frame: {e}")
                 break
 
+        pipeline.finish()
+        pipeline.join()
+        if self.exporter:
+            self.exporter.finish()
+        if self.recorder:
+            self.recorder.finish()
+        self._report_pipeline_statistics(pipeline)
         self._cleanup_detection(mode)
 
-    def _process_frame(self, img: Any, frame_count: int, mode: str) -> None:
-        """Process a single frame for object detection.
+    def _create_pipeline(self, mode: str) -> Pipeline:
+        """Create the stages detect, annotate, log and display.
+
+        Worker counts, queue sizes and policies ("block" or "drop") are read
+        from config. IMAGE mode always blocks, so no image is skipped.
+        Stages with state (stateful backend, change gating, logger, display
+        order) run with one worker. Stages pass frames on in order of capture,
+        also with several workers.
+
+        Args:
+            mode (str): Current detection mode.
+
+        Returns:
+            Pipeline: Pipeline, which is not started yet.
+        """
+        config_stages = ConfigReader("config.json").get_value('pipeline_stages', {})
+        stateful_detection = self.detector.stateful or (
+            mode == "CAMERA" and self.change_detector is not None)
+        
+        pipeline = Pipeline(self.stop_event)
+        for name, process, multi_worker in (
+                ("detect", self._detect_frame, not stateful_detection),
+                ("annotate", self._annotate_frame, True),
+                ("log", self._log_frame, False),
+                ("display", self._display_frame, False)):
+            config_stage = config_stages.get(name, {})
+            policy = config_stage.get('policy', POLICY_BLOCK)
+            pipeline.add_stage(
+                name, process,
+                workers=int(config_stage.get('workers', 1)) if multi_worker else 1,
+                queue_size=int(config_stage.get('queue_size', 4)),
+                policy=policy if mode == "CAMERA" else POLICY_BLOCK,
+                process_when_stopping=(name == "log"),
+                ordered=True
+            )
+        return pipeline
+
+    def _capture_frame(self, stream: DataStream, frame_count: int, 
+                       mode: str) -> Optional[FrameTask]:
+        """Take the current frame of the stream for the pipeline.
+        
+        Image files with cached results are not detected again. They are not
+        decoded either, if the cached thumbnail is shown only, i.e. if 
+        export and recording are disabled.
         
         Args:
-            img Any: Image data to process.
+            stream (DataStream): Stream with current image to process.
             frame_count (int): Current frame number.
             mode (str): Current detection mode.
+
+        Returns:
+            Optional[FrameTask]: Task of frame. None, if image cannot be read.
         """
-        try:
-            # set Image Name
-            current_image_name = None
-            if mode == "IMAGE":
-                image_names = self.get_image_names()
-                if image_names and 0 <= frame_count - 1 < len(image_names):
-                    current_image_name = image_names[frame_count - 1]
-            else:
-                current_image_name = f"frame_{frame_count}"
-            
-            # Name for Logger
-            image_identifier = current_image_name if current_image_name else f"image_{frame_count}"
-            self.logger.set_current_image(image_identifier)
-            
-            # Image processing
-            processed_img = PictureModifications.resize_the_picture(img)
-             
-            # Detect shapes
-            shapes = Detection.shape_detection(img)
-            recognized = Detection.shape_recognition(shapes, img)
-           
-            # show the image
-            self.show_image_callback(img)
-
-            # Logging
-            for shape in recognized:
-                self.logger.log_data(
-                    pattern=shape.get('pattern', 'Unknown'),
-                    color=shape.get('color', 'Unknown'),
-                    frame=frame_count if mode == "CAMERA" else None,
-                    confidence=shape.get('confidence', 'N/A')
-                )
-    
-        except Exception as e:
-            print(f"General error in _process_frame: {e}")
+        # set Image Name
+        current_image_name = None
+        if mode == "IMAGE":
+            image_names = self.get_image_names()
+            if image_names and 0 <= frame_count - 1 < len(image_names):
+                current_image_name = image_names[frame_count - 1]
+        else:
+            current_image_name = f"frame_{frame_count}"
+        image_identifier = current_image_name if current_image_name else f"image_{frame_count}"
+        task = FrameTask(frame_count, image_identifier, mode)
+        task.path = stream.get_current_path()
+        
+        # Look up cached results
+        if self.detection_cache:
+            task.cache_key = DetectionCache.make_key(
+                stream.get_current_content_hash(), self._parameter_hash)
+            cached = self.detection_cache.get(task.cache_key)
+            if cached:
+                results, thumbnail = cached
+                task.recognized = [DetectedShape.from_dict(result) 
+                                   for result in results]
+                task.logged = task.recognized
+                task.cached = True
+                if not (self.exporter or self.recorder): # full resolution
+                    task.img = thumbnail
+                    task.annotated = thumbnail is not None
+        
+        if task.img is None: # not cached or no thumbnail stored
+            task.img = stream.get_current_image()
+            if task.img is None:
+                print(f"Cannot read image: {image_identifier}")
+                return None
+        return task
+
+    def _detect_frame(self, task: FrameTask) -> FrameTask:
+        """Pipeline stage: detect and recognize shapes in frame by the
+        detection backend.
+
+        With a tracking backend, only shapes appearing for the first time are
+        kept for logging. With change gating in CAMERA mode, results of the
+        last processed frame are reused for unchanged frames.
+
+        Args:
+            task (FrameTask): Task of frame.
+
+        Returns:
+            FrameTask: Task with recognized shapes.
+        """
+        if task.cached:
+            return task
+        
+        gating = self.change_detector is not None and task.mode == "CAMERA"
+        if gating:
+            changed = self.change_detector.has_changed(task.img)
+            self._report_gating_statistics(task.frame_count)
+            if not changed and self._last_frame_result is not None:
+                task.recognized = self._last_frame_result
+                # unchanged frame, no new tracks
+                task.logged = [] if self.detector.tracking else task.recognized
+                return task
+        
+        task.recognized, task.logged = self.detector.run(task.img, task.frame_count)
+        # results of stateful backends depend on previous frames
+        task.detected = not self.detector.stateful
+        if gating:
+            self._last_frame_result = task.recognized
+        return task
+
+    def _annotate_frame(self, task: FrameTask) -> FrameTask:
+        """Pipeline stage: draw recognized shapes at output resolution, 
+        store results in cache and pass annotated frame to export. 
+        Nothing is drawn, if headless and export and recording are disabled.
+
+        Args:
+            task (FrameTask): Task of frame.
+
+        Returns:
+            FrameTask: Task of frame.
+        """
+        if not task.annotated and (not self.headless or self.exporter or self.recorder):
+            task.img = AnnotationRenderer.render(task.img, task.recognized, 
+                                                 self.annotation_max_size)
+            task.annotated = True
+        if task.detected and task.cache_key:
+            self.detection_cache.put(task.cache_key,
+                                     [shape.to_dict() for shape in task.recognized],
+                                     task.img if task.annotated else None)
+        if self.exporter:
+            self.exporter.export(task.img, task.image_name)
+        return task
+
+    def _log_frame(self, task: FrameTask) -> FrameTask:
+        """Pipeline stage: log recognized shapes as CSV rows and count them
+        in the live statistics. Afterwards, the image file is marked as 
+        processed, so a watched folder skips it after a restart.
+
+        Args:
+            task (FrameTask): Task of frame.
+
+        Returns:
+            FrameTask: Task of frame.
+        """
+        if self.statistics:
+            self.statistics.add_shapes(task.logged)
+            self.statistics.flush_if_due()
+        if self.log_rows:
+            self.logger.set_current_image(task.image_name)
+            self.logger.log_shapes(
+                task.logged,
+                frame=task.frame_count if task.mode == "CAMERA" else None,
+                track_id=self.detector.tracking
+            )
+        if task.path:
+            self.data_selector.get_stream().mark_processed(task.path)
+        return task
+
+    def _display_frame(self, task: FrameTask) -> None:
+        """Pipeline stage: record and show annotated frame, if not headless.
+
+        Args:
+            task (FrameTask): Task of frame.
+        """
+        if self.recorder:
+            self.recorder.record(task.img, task.frame_count)
+        if not self.headless:
+            self.show_image_callback(task.img, task.image_name)
+
+    def _report_pipeline_statistics(self, pipeline: Pipeline) -> None:
+        """Print processed and dropped frames per pipeline stage.
+
+        Args:
+            pipeline (Pipeline): Finished pipeline.
+        """
+        for name, statistics in pipeline.get_statistics().items():
+            print(f"Pipeline stage {name}: {statistics['processed']} processed, "
+                  f"{statistics['dropped']} dropped")
+        statistics = self.detector.get_statistics()
+        print(f"Detection backend {self.detector.name}: {statistics['frames']} "
+              f"frames, {statistics['shapes']} shapes, "
+              f"{statistics['mean_ms']:.1f} ms per frame")
+        if 'buffer_allocations' in statistics:
+            print(f"Detection buffers: {statistics['buffer_allocations']} "
+                  f"allocations for {statistics['frames']} frames")
+        if self.exporter:
+            statistics = self.exporter.get_statistics()
+            print(f"Export to {self.exporter.path_folder}: {statistics['written']} "
+                  f"written, {statistics['dropped']} dropped")
+        if self.recorder:
+            statistics = self.recorder.get_statistics()
+            print(f"Recording {self.recorder.path_video}: {statistics['written']} "
+                  f"frames written, {statistics['dropped']} dropped")
+
+    def _report_gating_statistics(self, frame_count: int, 
+                                  interval: int = 100) -> None:
+        """Report share of skipped unchanged frames every interval frames.
+
+        Args:
+            frame_count (int): Current frame number.
+            interval (int, optional): Frames between reports. Defaults to 100.
+        """
+        if frame_count % interval != 0:
+            return
+        statistics = self.change_detector.get_statistics()
+        self.update_status_callback(
+            f"Status: Detection running... "
+            f"{statistics['skip_rate']:.0%} of frames unchanged.")
 
     def _cleanup_detection(self, mode: str) -> None:
         """Clean up after detection is complete.
@@ -276,6 +659,16 @@ class DetectionController:
             mode (str): Current detection mode.
         """
         try:
+            if self.change_detector and mode == "CAMERA":
+                statistics = self.change_detector.get_statistics()
+                print(f"Change gating: {statistics['frames_skipped']} of "
+                      f"{statistics['frames_total']} frames skipped "
+                      f"({statistics['skip_rate']:.1%})")
+            if self.detection_cache:
+                self.detection_cache.save()
+            if self.statistics:
+                self.statistics.flush()
+            self.logger.wait_for_rotation()
             stream = self.data_selector.get_stream()
             if stream and (mode == "IMAGE" or self.stop_event.is_set()):
                 stream.close_data_stream()
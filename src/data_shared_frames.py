@@ -0,0 +1,283 @@
+"""Module for passing frames between processes through shared memory."""
+
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+ALIGNMENT = 64 # bytes, start of every slot
+
+
+def _get_aligned(size:int) -> int:
+    """get size rounded up to alignment.
+
+    Args:
+        size (int): size in bytes
+
+    Returns:
+        int: aligned size in bytes
+    """
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+class SharedFrame(NamedTuple):
+    """Handle of a frame in a slot of SharedFramePool. Only the handle is
+    passed to other processes, not the frame."""
+    slot: int
+    generation: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class SharedFrameView:
+    """Read access to the slots of a SharedFramePool, e.g. in a worker
+    process.
+
+    Memory starts with one generation counter per slot, followed by the
+    slots. The counter of a slot is odd while a frame is written and
+    increases with every frame, so handles of overwritten frames are
+    detected.
+    """
+    def __init__(self, _name:str, _slots:int, _slot_bytes:int) -> None:
+        """Initialize view, attaches to existing shared memory
+
+        Args:
+            _name (str): name of shared memory
+            _slots (int): number of slots
+            _slot_bytes (int): size of one slot in bytes
+        """
+        self.slots = _slots
+        self.slot_bytes = _slot_bytes
+        self._memory = self._open_memory(_name)
+        self.name = self._memory.name
+        self._generations = np.ndarray((self.slots,), dtype=np.int64,
+                                       buffer=self._memory.buf)
+
+
+    def _open_memory(self, name:str) -> shared_memory.SharedMemory:
+        """opens shared memory.
+
+        Args:
+            name (str): name of shared memory
+
+        Returns:
+            shared_memory.SharedMemory: shared memory
+        """
+        return shared_memory.SharedMemory(name)
+
+
+    def get_frame(self, frame:SharedFrame) -> np.ndarray:
+        """get frame without copying it. The frame is valid until its slot
+        is released and must not be modified.
+
+        Args:
+            frame (SharedFrame): handle of frame
+
+        Returns:
+            np.ndarray: frame in shared memory
+        """
+        offset = self._get_offset(frame.slot)
+        return np.ndarray(frame.shape, dtype=np.dtype(frame.dtype),
+                          buffer=self._memory.buf, offset=offset)
+
+
+    def is_valid(self, frame:SharedFrame) -> bool:
+        """checks, if slot still holds the frame of handle, e.g. after
+        processing it.
+
+        Args:
+            frame (SharedFrame): handle of frame
+
+        Returns:
+            bool: True, if frame was not overwritten. False, otherwise.
+        """
+        return int(self._generations[frame.slot]) == frame.generation
+
+
+    def close(self) -> None:
+        """closes access to shared memory. Frames from get_frame must not be
+        used afterwards."""
+        self._generations = None
+        try:
+            self._memory.close()
+        except BufferError as e:
+            print(f"ERROR: Frames of shared memory still in use: \n{e}")
+
+
+    def _get_offset(self, slot:int) -> int:
+        """get offset of slot in shared memory.
+
+        Args:
+            slot (int): number of slot
+
+        Returns:
+            int: offset in bytes
+        """
+        return _get_aligned(self.slots*8) + slot*self.slot_bytes
+
+
+
+class SharedFramePool(SharedFrameView):
+    """Fixed set of reusable frame slots in shared memory, owned by the
+    producing process.
+
+    Frames are copied once into a free slot and passed on as SharedFrame
+    handles of a few bytes, so costs of passing frames to other processes
+    do not depend on the resolution. A slot is reused only after it was
+    released by the owner, e.g. when the worker reported its results.
+    """
+    def __init__(self, _slots:int=4, _slot_bytes:int=1920*1080*3) -> None:
+        """Initialize frame pool, creates shared memory
+
+        Args:
+            _slots (int, optional): number of slots. Defaults to 4.
+            _slot_bytes (int, optional): maximum size of one frame in bytes.
+                                         Defaults to 1080p BGR.
+        """
+        slots = max(1, _slots)
+        slot_bytes = _get_aligned(max(1, _slot_bytes))
+        self._size = _get_aligned(slots*8) + slots*slot_bytes
+        super().__init__("", slots, slot_bytes)
+        self._generations[:] = 0
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+        self._used_slots: Set[int] = set()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+
+    def _open_memory(self, name:str) -> shared_memory.SharedMemory:
+        return shared_memory.SharedMemory(create=True, size=self._size)
+
+
+    def put(self, img:np.ndarray,
+            timeout:Optional[float]=None) -> Optional[SharedFrame]:
+        """copies frame into a free slot.
+
+        Args:
+            img (np.ndarray): frame
+            timeout (Optional[float], optional): maximum time to wait for a
+                                free slot in seconds. Defaults to None,
+                                wait until a slot is released.
+
+        Returns:
+            Optional[SharedFrame]: handle of frame. None, if frame is too
+                                   large or no slot became free.
+        """
+        if img.nbytes > self.slot_bytes:
+            print(f"ERROR: Frame of {img.nbytes} bytes exceeds slot of "
+                  f"{self.slot_bytes} bytes")
+            return None
+        try:
+            slot = self._free_slots.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self.dropped += 1
+            return None
+        with self._lock:
+            self._used_slots.add(slot)
+
+        self._generations[slot] += 1 # odd while writing
+        frame = SharedFrame(slot, int(self._generations[slot]) + 1, img.shape,
+                            img.dtype.str)
+        np.copyto(self.get_frame(frame), img)
+        self._generations[slot] += 1
+        return frame
+
+
+    def release(self, frame:SharedFrame) -> bool:
+        """releases slot of frame for reuse. Handles of the frame become
+        invalid, as soon as the slot is written again.
+
+        Args:
+            frame (SharedFrame): handle of frame
+
+        Returns:
+            bool: True, if released. False, if slot was not in use.
+        """
+        with self._lock:
+            if frame.slot not in self._used_slots or not self.is_valid(frame):
+                print(f"ERROR: Slot {frame.slot} of shared frames released twice")
+                return False
+            self._used_slots.remove(frame.slot)
+        self._free_slots.put(frame.slot)
+        return True
+
+
+    def get_attach_arguments(self) -> Tuple[str, int, int]:
+        """get arguments of SharedFrameView to attach in other processes.
+
+        Returns:
+            Tuple[str, int, int]: name, number of slots and slot size
+        """
+        return self.name, self.slots, self.slot_bytes
+
+
+    def close(self) -> None:
+        """closes and removes shared memory. All views must be closed."""
+        super().close()
+        try:
+            self._memory.unlink()
+        except FileNotFoundError:
+            pass
+
+
+
+def _detect_worker(attach_arguments:Tuple[str, int, int],
+                   frames:"queue.Queue", results:"queue.Queue") -> None:
+    """Worker process of demo: detects shapes of shared frames."""
+    from detection_shape import Detection
+    view = SharedFrameView(*attach_arguments)
+    while (frame := frames.get()) is not None:
+        img = view.get_frame(frame)
+        shapes = Detection.shape_recognition(Detection.shape_detection(img), img)
+        results.put((frame, len(shapes), view.is_valid(frame)))
+    view.close()
+
+
+if __name__ == "__main__":
+    """Comparison of passing frames and handles to a worker process"""
+    import time
+    import multiprocessing
+    for height, width in ((480, 640), (1080, 1920), (2160, 3840)):
+        img = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+        pool = SharedFramePool(2, img.nbytes)
+        transport = multiprocessing.Queue()
+        time_start = time.perf_counter()
+        for _ in range(20):
+            transport.put(img)
+            transport.get()
+        time_pickled = (time.perf_counter() - time_start) / 20
+        time_start = time.perf_counter()
+        for _ in range(20):
+            frame = pool.put(img)
+            transport.put(frame)
+            transport.get()
+            pool.release(frame)
+        time_shared = (time.perf_counter() - time_start) / 20
+        print(f"{width}x{height}: pickled {time_pickled*1000:.2f} ms, "
+              f"shared {time_shared*1000:.2f} ms per frame")
+        pool.close()
+
+    import cv2
+    pool = SharedFramePool(2, 1920*1080*3)
+    frames, results = multiprocessing.Queue(), multiprocessing.Queue()
+    worker = multiprocessing.Process(target=_detect_worker,
+                                     args=(pool.get_attach_arguments(), frames, results))
+    worker.start()
+    for number in range(5):
+        frames.put(pool.put(cv2.imread(f"in/test_image_0{number}."
+                                       f"{'JPG' if number == 3 else 'png'}")))
+        if number > 0: # one frame in process, one queued
+            frame, number_shapes, valid = results.get()
+            print(f"slot {frame.slot}: {number_shapes} shapes, valid {valid}")
+            pool.release(frame)
+    frames.put(None)
+    frame, number_shapes, valid = results.get()
+    print(f"slot {frame.slot}: {number_shapes} shapes, valid {valid}")
+    pool.release(frame)
+    worker.join()
+    pool.close()
@@ -1,10 +1,16 @@
+import os
 import cv2
-from typing import Optional, Tuple, final
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple, final
 from abc import ABC, abstractmethod
 
 import handling_cameras
 import handling_paths_files
 from handling_paths_files import IntegrityChecker
+from handling_configurations import ConfigReader
+from handling_folder_watch import FolderWatcher, ProcessedIndex
+from data_shared_frames import SharedFrame, SharedFramePool
 
 
 class DataStream(ABC):
@@ -13,7 +19,7 @@ class DataStream(ABC):
     def __init__(self) -> None:
         """Initialized DataStream"""
         self.current_image = None
-        self.image_tuple:Tuple[cv2.typing.matLike, str]=("","")
+        self.image_tuple:Tuple[List, List[str]]=("","")
 
     @abstractmethod
     def open_data_stream(self) -> bool:
@@ -42,14 +48,85 @@ class DataStream(ABC):
         """
         pass
 
+    def interrupt_data_stream(self) -> None:
+        """interrupts blocking updates of data stream, e.g. waiting for new 
+        images. Nothing to interrupt by default.
+        """
+        pass
+
     @final
     def get_current_image(self) -> Optional[cv2.Mat]:
-        """get current image of data stream.
+        """get current image of data stream. 
+        Image is loaded first, if stream loads images lazily.
 
         Returns:
             cv2.typing.MatLike: current image, if successful. None, otherwise.
         """
+        if self.current_image is None:
+            self.current_image = self._load_current_image()
         return self.current_image
+
+    @final
+    def write_current_image(self, pool:SharedFramePool,
+                            timeout:Optional[float]=None) -> Optional[SharedFrame]:
+        """writes current image once into a slot of shared memory, so only
+        its handle is passed to other processes.
+
+        Args:
+            pool (SharedFramePool): pool of shared frames
+            timeout (Optional[float], optional): maximum time to wait for a
+                                free slot in seconds. Defaults to None.
+
+        Returns:
+            Optional[SharedFrame]: handle of frame. None, if no image or no
+                                   free slot.
+        """
+        img = self.get_current_image()
+        if img is None:
+            return None
+        return pool.put(img, timeout)
+
+    def has_current_image(self) -> bool:
+        """checks, if stream has a current image (loaded or not).
+
+        Returns:
+            bool: True, if current image exists. False, otherwise.
+        """
+        return self.current_image is not None
+    
+    def get_current_content_hash(self) -> str:
+        """get content hash of current image file.
+
+        Returns:
+            str: content hash. Empty, if stream has no files.
+        """
+        return ""
+    
+    def get_current_path(self) -> str:
+        """get path of current image file.
+
+        Returns:
+            str: path of file. Empty, if stream has no files.
+        """
+        return ""
+    
+    def mark_processed(self, path_file:str) -> None:
+        """marks image file as processed, after its results were logged.
+        Nothing to mark by default.
+
+        Args:
+            path_file (str): path of image file, see get_current_path
+        """
+        pass
+    
+    def _load_current_image(self) -> Optional[cv2.Mat]:
+        """loads current image, if stream loads images lazily. 
+        Nothing to load by default.
+
+        Returns:
+            cv2.typing.MatLike: loaded image. None, otherwise.
+        """
+        return None
     
     @final
     def get_names_images_list(self):
@@ -114,9 +191,24 @@ class FolderStream(DataStream):
         """
         super().__init__()
         self._id_image:int = 0
+        config_reader = ConfigReader("config.json")
+        self._detection_resolution = config_reader.get_int(
+            'detection_resolution', 0)
+        self.watch_folder: bool = bool(config_reader.get_value(
+            'folder_watch', False))
+        self._poll_interval = float(config_reader.get_value(
+            'folder_watch_poll_interval', 0.5))
+        self._recursive: bool = bool(config_reader.get_value(
+            'folder_recursive', False))
         
         self.ph = handling_paths_files.PathHandling(_folder_path)
         self.fh = handling_paths_files.FileHandling()
+        
+        self._watcher: Optional[FolderWatcher] = None
+        self._processed_index: Optional[ProcessedIndex] = None
+        self._waiting_files: Deque[str] = deque()
+        self._path_current: str = ""
+        self._stop_event = threading.Event()
 
 
     def open_data_stream(self) -> bool:
@@ -129,8 +221,14 @@ class FolderStream(DataStream):
         
         if not(IntegrityChecker.check_path_validity(input_path)):
             return False
-        self.fh = handling_paths_files.FileHandling(input_path)
-        self.image_tuple = self.fh.open_all_files()
+        path_index = handling_paths_files.FileIndex.get_index_path(
+            self.ph.get_path_abs_output(), input_path)
+        self.fh = handling_paths_files.FileHandling(
+            input_path, self._detection_resolution, self._recursive, 
+            handling_paths_files.FileIndex(path_index))
+        if self.watch_folder:
+            return self._open_watch_stream(input_path)
+        self.image_tuple = self.fh.list_all_files()
         if len(self.image_tuple[0]) == 0:
             print("ERROR: no Image found")
             return False
@@ -144,11 +242,14 @@ class FolderStream(DataStream):
         Returns:
             bool: True, if successful. False, otherwise.
         """
-        image_list = self.image_tuple[0]
-        amount_images = len(image_list)
+        if self.watch_folder:
+            return self._update_watch_stream()
+        path_list = self.image_tuple[0]
+        amount_images = len(path_list)
         
         if amount_images > self._id_image:
-            self.current_image = image_list[self._id_image]
+            self.current_image = None # decoded, when needed
+            self._path_current = path_list[self._id_image]
             self._id_image += 1
             return True
         return False
@@ -159,7 +260,111 @@ class FolderStream(DataStream):
         Returns:
             bool: True, if successful. False, otherwise.
         """
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        if self.fh.file_index is not None:
+            self.fh.file_index.save()
+        self._path_current = ""
         self.current_image = None
         self.image_tuple = ()
         self._id_image = 0
         return True
+
+    def interrupt_data_stream(self) -> None:
+        """interrupts waiting for new images in watched folder."""
+        self._stop_event.set()
+
+    def has_current_image(self) -> bool:
+        """checks, if stream has a current image (loaded or not).
+
+        Returns:
+            bool: True, if current image exists. False, otherwise.
+        """
+        return self.current_image is not None or bool(self._path_current)
+
+    def get_current_content_hash(self) -> str:
+        """get content hash of current image file.
+
+        Returns:
+            str: content hash. Empty, if not available.
+        """
+        if not (self._path_current and self.fh.file_index):
+            return ""
+        return self.fh.file_index.get_content_hash(self._path_current)
+
+    def get_current_path(self) -> str:
+        """get path of current image file.
+
+        Returns:
+            str: path of file. Empty, if no current file.
+        """
+        return self._path_current
+
+    def mark_processed(self, path_file:str) -> None:
+        """marks image file of watched folder as processed, so it is 
+        skipped after a restart. Called, after its results were logged.
+
+        Args:
+            path_file (str): path of image file, see get_current_path
+        """
+        if path_file and self._processed_index is not None:
+            self._processed_index.mark_processed(path_file)
+
+    def _load_current_image(self) -> Optional[cv2.Mat]:
+        """decodes current image file.
+
+        Returns:
+            cv2.typing.MatLike: decoded image. None, otherwise.
+        """
+        if not self._path_current:
+            return None
+        return self.fh.open_one_file(self._path_current)
+
+    def _open_watch_stream(self, input_path:str) -> bool:
+        """starts watching input folder. Images are read, when they arrive. 
+        Already processed images (see processed index) are skipped.
+
+        Args:
+            input_path (str): path of watched folder
+
+        Returns:
+            bool: True, if successful. False, otherwise.
+        """
+        self._stop_event.clear()
+        self._watcher = FolderWatcher(input_path, self._poll_interval, 
+                                      self._stop_event)
+        if not self._watcher.start():
+            return False
+        path_index = os.path.join(self.ph.get_path_abs_output(), 
+                                  "processed_files.jsonl")
+        self._processed_index = ProcessedIndex(path_index)
+        self._waiting_files.clear()
+        self._path_current = ""
+        self.current_image = None
+        self.image_tuple = ([], [])
+        return True
+
+    def _update_watch_stream(self) -> bool:
+        """waits for the next new image. The current image is marked as 
+        processed by mark_processed, after it was logged.
+
+        Returns:
+            bool: True, if successful. False, if stream was stopped.
+        """
+        self._path_current = ""
+        
+        while not self._stop_event.is_set():
+            if not self._waiting_files:
+                for path_file in self._watcher.get_complete_files():
+                    if not self._processed_index.is_processed(path_file):
+                        self._waiting_files.append(path_file)
+                continue
+            
+            path_file = self._waiting_files.popleft()
+            self.current_image = None # decoded, when needed
+            self._path_current = path_file
+            self.image_tuple[1].append(os.path.basename(path_file))
+            return True
+        return False
@@ -0,0 +1,375 @@
+"""Module for interchangeable detection backends and their registry."""
+
+import time
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Tuple
+
+import cv2
+
+from detection_shape import Detection, DetectedShape, DetectionBuffers
+from detection_segmentation import ColorSegmentation
+from detection_tiles import TiledDetection
+from detection_tracking import ShapeTracker
+from handling_configurations import ConfigReader
+from modificators_image import PictureModifications
+
+
+class DetectorBackend(ABC):
+    """Interface of detection backends.
+
+    Backends detect and recognize shapes in a frame and return them as
+    DetectedShape. Every call of run is timed, the timings are passed to
+    the hooks and summed up in the statistics.
+    """
+    name = ""
+    stateful = False # frames must be detected one after another, in order
+    tracking = False # shapes have track ids, only new shapes are logged
+
+    def __init__(self) -> None:
+        """Initialize backend"""
+        self._hooks: List[Callable[[str, float, int], None]] = []
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.shapes = 0
+        self.seconds = 0.0
+
+
+    @abstractmethod
+    def detect(self, img:cv2.typing.MatLike,
+               frame_count:int) -> Tuple[List[DetectedShape], List[DetectedShape]]:
+        """detects and recognizes shapes in frame.
+
+        Args:
+            img (cv2.typing.MatLike): frame
+            frame_count (int): frame number
+
+        Returns:
+            Tuple[List[DetectedShape], List[DetectedShape]]:
+                - [0] all shapes in frame
+                - [1] shapes to log
+        """
+
+
+    def get_parameters(self) -> Dict[str, Any]:
+        """get all parameters, which affect the detection results.
+
+        Returns:
+            Dict[str, Any]: parameters of backend
+        """
+        return dict(Detection.get_parameters(), backend=self.name)
+
+
+    def reset(self) -> None:
+        """removes state of previous frames and statistics."""
+        with self._lock:
+            self.frames = 0
+            self.shapes = 0
+            self.seconds = 0.0
+
+
+    def run(self, img:cv2.typing.MatLike,
+            frame_count:int) -> Tuple[List[DetectedShape], List[DetectedShape]]:
+        """detects shapes in frame and records time of detection.
+
+        Args:
+            img (cv2.typing.MatLike): frame
+            frame_count (int): frame number
+
+        Returns:
+            Tuple[List[DetectedShape], List[DetectedShape]]:
+                - [0] all shapes in frame
+                - [1] shapes to log
+        """
+        time_start = time.perf_counter()
+        recognized, logged = self.detect(img, frame_count)
+        seconds = time.perf_counter() - time_start
+        with self._lock:
+            self.frames += 1
+            self.shapes += len(recognized)
+            self.seconds += seconds
+        for hook in self._hooks:
+            hook(self.name, seconds, len(recognized))
+        return recognized, logged
+
+
+    def add_hook(self, hook:Callable[[str, float, int], None]) -> None:
+        """adds function, which is called after every detection with name of
+        backend, seconds of detection and number of shapes.
+
+        Args:
+            hook (Callable[[str, float, int], None]): function to call
+        """
+        self._hooks.append(hook)
+
+
+    def get_statistics(self) -> Dict[str, float]:
+        """get number of frames and shapes and mean time of detection.
+
+        Returns:
+            Dict[str, float]: statistics of backend
+        """
+        with self._lock:
+            mean_ms = 1000*self.seconds/self.frames if self.frames else 0.0
+            return {'frames': self.frames, 'shapes': self.shapes,
+                    'mean_ms': mean_ms}
+
+
+
+class ContourBackend(DetectorBackend):
+    """Detection of shapes by their edges, see Detection. Every detecting
+    thread reuses its own scratch buffers for all frames of the stream."""
+    name = "contour"
+
+    def __init__(self) -> None:
+        """Initialize contour backend"""
+        super().__init__()
+        self._local = threading.local()
+        self._buffers: List[DetectionBuffers] = [] # of all threads
+
+
+    def detect(self, img:cv2.typing.MatLike,
+               frame_count:int) -> Tuple[List[DetectedShape], List[DetectedShape]]:
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = DetectionBuffers()
+            with self._lock:
+                self._buffers.append(buffers)
+        shapes = Detection.shape_detection(img, buffers=buffers)
+        recognized = Detection.shape_recognition(shapes, img, buffers=buffers)
+        return recognized, recognized
+
+
+    def get_statistics(self) -> Dict[str, float]:
+        """get number of frames and shapes, mean time of detection and number
+        of allocations of scratch buffers, which is one per thread and 
+        resolution, if buffers are reused.
+
+        Returns:
+            Dict[str, float]: statistics of backend
+        """
+        statistics = super().get_statistics()
+        with self._lock:
+            statistics['buffer_allocations'] = sum(buffers.allocations 
+                                                   for buffers in self._buffers)
+        return statistics
+
+
+
+class ColorSegmentationBackend(DetectorBackend):
+    """Detection of solid-colored shapes, see ColorSegmentation."""
+    name = "color_segmentation"
+
+    def detect(self, img:cv2.typing.MatLike,
+               frame_count:int) -> Tuple[List[DetectedShape], List[DetectedShape]]:
+        recognized = ColorSegmentation.shape_detection_recognition(img)
+        return recognized, recognized
+
+
+
+class TiledBackend(DetectorBackend):
+    """Detection of shapes in overlapping tiles of very large images, see
+    TiledDetection."""
+    name = "tiled"
+
+    def __init__(self, _tile_size:int=4096, _overlap:int=256,
+                 _workers:int=0) -> None:
+        """Initialize tiled backend
+
+        Args:
+            _tile_size (int, optional): length of tile sides. Defaults to 4096.
+            _overlap (int, optional): overlap of neighboring tiles.
+                                      Defaults to 256.
+            _workers (int, optional): number of threads. Defaults to 0,
+                                      one per core.
+        """
+        super().__init__()
+        self.tile_size = _tile_size
+        self.overlap = _overlap
+        self.workers = _workers
+
+
+    def detect(self, img:cv2.typing.MatLike,
+               frame_count:int) -> Tuple[List[DetectedShape], List[DetectedShape]]:
+        recognized = TiledDetection.shape_detection_recognition(
+            img, self.tile_size, self.overlap, self.workers)
+        return recognized, recognized
+
+
+    def get_parameters(self) -> Dict[str, Any]:
+        return dict(super().get_parameters(), tile_size=self.tile_size,
+                    overlap=self.overlap)
+
+
+
+class DownscaledBackend(DetectorBackend):
+    """Detection on a downscaled frame by another stateless backend. 
+    Results are scaled back to frame coordinates."""
+    name = "downscaled"
+
+    def __init__(self, _backend:DetectorBackend, _max_size:int=640) -> None:
+        """Initialize downscaled backend
+
+        Args:
+            _backend (DetectorBackend): stateless backend detecting on
+                                        downscaled frame
+            _max_size (int, optional): maximum length of longer side of
+                                       downscaled frame. Defaults to 640.
+        """
+        super().__init__()
+        self.backend = _backend
+        self.max_size = _max_size
+
+
+    def detect(self, img:cv2.typing.MatLike,
+               frame_count:int) -> Tuple[List[DetectedShape], List[DetectedShape]]:
+        small_img = PictureModifications.resize_to_max_size(img, self.max_size)
+        recognized, logged = self.backend.detect(small_img, frame_count)
+        if small_img is not img:
+            factor = img.shape[1] / small_img.shape[1]
+            for shape in recognized: # logged shapes are the same objects
+                shape.scale(factor)
+        return recognized, logged
+
+
+    def get_parameters(self) -> Dict[str, Any]:
+        return dict(self.backend.get_parameters(), backend=self.name,
+                    inner_backend=self.backend.name, max_size=self.max_size)
+
+
+    def reset(self) -> None:
+        super().reset()
+        self.backend.reset()
+
+
+
+class TrackingBackend(DetectorBackend):
+    """Detection of shapes in changed regions of frames only, see
+    ShapeTracker. Only shapes appearing for the first time are logged."""
+    name = "tracking"
+    stateful = True
+    tracking = True
+
+    def __init__(self, _redetect_interval:int=10) -> None:
+        """Initialize tracking backend
+
+        Args:
+            _redetect_interval (int, optional): frames between two full
+                                                detections. Defaults to 10.
+        """
+        super().__init__()
+        self.shape_tracker = ShapeTracker(_redetect_interval)
+
+
+    def detect(self, img:cv2.typing.MatLike,
+               frame_count:int) -> Tuple[List[DetectedShape], List[DetectedShape]]:
+        return self.shape_tracker.process_frame(img, frame_count)
+
+
+    def get_parameters(self) -> Dict[str, Any]:
+        return dict(super().get_parameters(),
+                    redetect_interval=self.shape_tracker.redetect_interval)
+
+
+    def reset(self) -> None:
+        super().reset()
+        self.shape_tracker.reset()
+
+
+
+class BackendRegistry:
+    """Registry of detection backends by name."""
+    _factories: Dict[str, Callable[[], DetectorBackend]] = {}
+
+    @staticmethod
+    def register(name:str, factory:Callable[[], DetectorBackend]) -> None:
+        """registers factory of backend.
+
+        Args:
+            name (str): name of backend in config
+            factory (Callable[[], DetectorBackend]): function creating backend
+        """
+        BackendRegistry._factories[name] = factory
+
+
+    @staticmethod
+    def get_names() -> List[str]:
+        """get names of all registered backends.
+
+        Returns:
+            List[str]: names of backends
+        """
+        return list(BackendRegistry._factories)
+
+
+    @staticmethod
+    def create(name:str) -> DetectorBackend:
+        """creates backend by name. Unknown names create the contour backend.
+
+        Args:
+            name (str): name of backend
+
+        Returns:
+            DetectorBackend: new backend
+        """
+        factory = BackendRegistry._factories.get(name)
+        if factory is None:
+            print(f"ERROR: Unknown detection backend {name}, using contour")
+            factory = BackendRegistry._factories[ContourBackend.name]
+        return factory()
+
+
+    @staticmethod
+    def create_for_stream(stream_type:str) -> DetectorBackend:
+        """creates backend configured for type of stream. Config
+        'detection_backend' is either one name for all streams or names by
+        type of stream, e.g. {"camera": "tracking", "image": "contour"}.
+
+        Args:
+            stream_type (str): type of stream ("camera" or "image")
+
+        Returns:
+            DetectorBackend: new backend
+        """
+        config_backend = ConfigReader("config.json").get_value('detection_backend',
+                                                               ContourBackend.name)
+        name = config_backend
+        if isinstance(config_backend, dict):
+            name = config_backend.get(stream_type, ContourBackend.name)
+        return BackendRegistry.create(name)
+
+
+def _create_downscaled_backend() -> DetectorBackend:
+    """creates downscaled backend from config."""
+    config_reader = ConfigReader("config.json")
+    backend = BackendRegistry.create(
+        config_reader.get_value('downscaled_backend', ContourBackend.name))
+    if backend.stateful or isinstance(backend, DownscaledBackend):
+        print(f"ERROR: Cannot downscale detection backend {backend.name}, using contour")
+        backend = ContourBackend()
+    return DownscaledBackend(backend, config_reader.get_int('downscaled_max_size', 640))
+
+
+BackendRegistry.register(ContourBackend.name, ContourBackend)
+BackendRegistry.register(ColorSegmentationBackend.name, ColorSegmentationBackend)
+BackendRegistry.register(DownscaledBackend.name, _create_downscaled_backend)
+BackendRegistry.register(TiledBackend.name, lambda: TiledBackend(
+    ConfigReader("config.json").get_int('tile_size', 4096),
+    ConfigReader("config.json").get_int('tile_overlap', 256),
+    ConfigReader("config.json").get_int('tile_workers', 0)))
+BackendRegistry.register(TrackingBackend.name, lambda: TrackingBackend(
+    ConfigReader("config.json").get_int('tracking_redetect_interval', 10)))
+
+
+
+if __name__ == "__main__":
+    """Comparison of all backends"""
+    import sys
+    path_image = sys.argv[1] if len(sys.argv) > 1 else R"in/test_image_04.png"
+    img = cv2.imread(path_image)
+    for name in BackendRegistry.get_names():
+        backend = BackendRegistry.create(name)
+        for frame_count in range(1, 21):
+            recognized, _ = backend.run(img, frame_count)
+        print(f"{name}: {backend.get_statistics()['mean_ms']:.1f} ms, "
+              f"{sorted((shape.pattern, shape.color) for shape in recognized)}")
@@ -0,0 +1,243 @@
+"""Module for caching detection results of unchanged images on disk."""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class DetectionCache:
+    """Persistent cache of detection results.
+
+    Entries are keyed by image content hash and detection parameter hash and
+    hold the recognized shapes and optionally an annotated thumbnail.
+    Least recently used entries are removed, when the size limit is exceeded.
+    """
+    _version = 1
+    _name_index = "cache_index.json"
+
+    def __init__(self, _path_folder:str, _max_size_mb:float=256,
+                 _store_thumbnails:bool=True, _thumbnail_size:int=640) -> None:
+        """Initialize detection cache
+
+        Args:
+            _path_folder (str): folder of cache files
+            _max_size_mb (float, optional): size limit of cache in MB.
+                                            Defaults to 256.
+            _store_thumbnails (bool, optional): store annotated thumbnails.
+                                                Defaults to True.
+            _thumbnail_size (int, optional): maximum side length of thumbnails
+                                             in pixels. Defaults to 640.
+        """
+        self.path_folder = _path_folder
+        self.max_size_bytes = int(_max_size_mb*1024*1024)
+        self.store_thumbnails = _store_thumbnails
+        self.thumbnail_size = max(1, _thumbnail_size)
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._size_bytes = 0
+        self._changed = False
+        self._lock = threading.Lock()
+        self._load()
+
+
+    @staticmethod
+    def get_parameter_hash(parameters:Dict[str, Any]) -> str:
+        """get hash of detection parameters.
+
+        Args:
+            parameters (Dict[str, Any]): all parameters, which affect detection
+
+        Returns:
+            str: hex digest of parameters
+        """
+        data = json.dumps(parameters, sort_keys=True, default=str)
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=8).hexdigest()
+
+
+    @staticmethod
+    def make_key(content_hash:str, parameter_hash:str) -> str:
+        """creates cache key.
+
+        Args:
+            content_hash (str): hash of image file content
+            parameter_hash (str): hash of detection parameters
+
+        Returns:
+            str: cache key. Empty, if content hash is missing.
+        """
+        if not content_hash:
+            return ""
+        return f"{content_hash}_{parameter_hash}"
+
+
+    def get(self, key:str) -> Optional[Tuple[List[Dict], Optional[cv2.typing.MatLike]]]:
+        """get cached results and thumbnail.
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            Optional[Tuple[List[Dict], Optional[cv2.typing.MatLike]]]:
+                recognized shapes and thumbnail (None, if not stored).
+                None, if not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._changed = True
+
+        thumbnail = None
+        if entry["thumbnail"]:
+            thumbnail = cv2.imread(os.path.join(self.path_folder,
+                                                entry["thumbnail"]))
+            if thumbnail is None: # thumbnail got lost, detect again
+                self._remove(key)
+                return None
+        return entry["results"], thumbnail
+
+
+    def put(self, key:str, results:List[Dict],
+            annotated_img:Optional[cv2.typing.MatLike]=None) -> None:
+        """stores results and thumbnail of annotated image.
+
+        Args:
+            key (str): cache key
+            results (List[Dict]): recognized shapes
+            annotated_img (Optional[cv2.typing.MatLike], optional):
+                                  annotated image. Defaults to None.
+        """
+        if not key:
+            return
+        name_thumbnail = ""
+        size_entry = len(json.dumps(results))
+        if self.store_thumbnails and annotated_img is not None:
+            name_thumbnail = f"{key}.jpg"
+            size_entry += self._write_thumbnail(name_thumbnail, annotated_img)
+
+        self._remove(key)
+        with self._lock:
+            self._entries[key] = {"results": results,
+                                  "thumbnail": name_thumbnail,
+                                  "size": size_entry}
+            self._size_bytes += size_entry
+            self._changed = True
+        self._evict()
+
+
+    def save(self) -> bool:
+        """saves cache index, if it changed.
+
+        Returns:
+            bool: True, if successful. False, otherwise.
+        """
+        with self._lock:
+            if not self._changed:
+                return True
+            data = {"version": self._version,
+                    "entries": list(self._entries.items())}
+            self._changed = False
+
+        path_index = os.path.join(self.path_folder, self._name_index)
+        path_temp = path_index + ".tmp"
+        try:
+            os.makedirs(self.path_folder, exist_ok=True)
+            with open(path_temp, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(path_temp, path_index)
+        except OSError as e:
+            print(f"ERROR: Cannot save detection cache: \n{e}")
+            return False
+        return True
+
+
+    def _write_thumbnail(self, name_thumbnail:str,
+                         annotated_img:cv2.typing.MatLike) -> int:
+        """writes downscaled annotated image.
+
+        Args:
+            name_thumbnail (str): file name of thumbnail
+            annotated_img (cv2.typing.MatLike): annotated image
+
+        Returns:
+            int: size of thumbnail file in bytes. 0, if not written.
+        """
+        height, width = annotated_img.shape[:2]
+        scale = self.thumbnail_size / max(height, width)
+        if scale < 1:
+            annotated_img = cv2.resize(annotated_img,
+                                       (int(width*scale), int(height*scale)),
+                                       interpolation=cv2.INTER_AREA)
+        success, buffer = cv2.imencode(".jpg", annotated_img,
+                                       [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not success:
+            return 0
+        try:
+            os.makedirs(self.path_folder, exist_ok=True)
+            buffer.tofile(os.path.join(self.path_folder, name_thumbnail))
+        except OSError as e:
+            print(f"ERROR: Cannot write thumbnail: \n{e}")
+            return 0
+        return int(buffer.size)
+
+
+    def _remove(self, key:str) -> None:
+        """removes entry and its thumbnail.
+
+        Args:
+            key (str): cache key
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            self._size_bytes -= entry["size"]
+            self._changed = True
+        if entry["thumbnail"]:
+            try:
+                os.remove(os.path.join(self.path_folder, entry["thumbnail"]))
+            except OSError:
+                pass
+
+
+    def _evict(self) -> None:
+        """removes least recently used entries until size limit is kept."""
+        while self._size_bytes > self.max_size_bytes and len(self._entries) > 1:
+            with self._lock:
+                key = next(iter(self._entries))
+            self._remove(key)
+
+
+    def _load(self) -> None:
+        """loads cache index, if it exists."""
+        path_index = os.path.join(self.path_folder, self._name_index)
+        if not os.path.isfile(path_index):
+            return
+        try:
+            with open(path_index, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: Cannot load detection cache, creating new one: \n{e}")
+            return
+        if data.get("version") != self._version:
+            return
+        self._entries = OrderedDict(data.get("entries", []))
+        self._size_bytes = sum(entry["size"] for entry in self._entries.values())
+
+
+
+if __name__ == "__main__":
+    """Testing of detection cache"""
+    cache = DetectionCache(os.path.join("out", "cache"), _max_size_mb=1)
+    key = DetectionCache.make_key("content", DetectionCache.get_parameter_hash({"a": 1}))
+    cache.put(key, [{"shape_code": 5, "color_code": 1}],
+              np.zeros((100, 100, 3), dtype=np.uint8))
+    print(cache.get(key)[0])
+    cache.save()
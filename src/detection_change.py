@@ -0,0 +1,118 @@
+"""Module for detecting, if a frame changed compared to the last processed one."""
+
+import cv2
+import numpy as np
+from typing import Dict, Optional
+
+
+class ChangeDetector:
+    """Cheap change detection on downscaled gray frames.
+
+    A frame counts as changed, if the share of pixels, which differ from the
+    last processed frame, exceeds the threshold. Frames are compared with the
+    last processed frame, so slow changes still add up.
+    """
+    def __init__(self, _change_threshold:float=0.002, _pixel_threshold:int=15,
+                 _scale:float=0.125) -> None:
+        """Initialize change detector
+
+        Args:
+            _change_threshold (float, optional): minimum share of changed
+                                pixels of a changed frame. Defaults to 0.002.
+            _pixel_threshold (int, optional): minimum gray value difference
+                                of a changed pixel. Defaults to 15.
+            _scale (float, optional): scale of frames for comparison.
+                                Defaults to 0.125.
+        """
+        self.change_threshold = _change_threshold
+        self.pixel_threshold = _pixel_threshold
+        self.scale = _scale
+
+        self._reference_gray: Optional[np.ndarray] = None
+        self.frames_total = 0
+        self.frames_skipped = 0
+
+
+    def reset(self) -> None:
+        """removes reference frame and statistics."""
+        self._reference_gray = None
+        self.frames_total = 0
+        self.frames_skipped = 0
+
+
+    def has_changed(self, img:cv2.typing.MatLike) -> bool:
+        """checks, if frame changed compared to last processed frame.
+        Changed frames become the new reference.
+
+        Args:
+            img (cv2.typing.MatLike): frame of camera
+
+        Returns:
+            bool: True, if changed. False, otherwise.
+        """
+        self.frames_total += 1
+        gray_small = self.get_small_gray(img, self.scale)
+        if (self._reference_gray is None or
+            self._reference_gray.shape != gray_small.shape):
+            self._reference_gray = gray_small
+            return True
+
+        diff = cv2.absdiff(gray_small, self._reference_gray)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        changed_share = cv2.countNonZero(mask) / mask.size
+        if changed_share > self.change_threshold:
+            self._reference_gray = gray_small
+            return True
+
+        self.frames_skipped += 1
+        return False
+
+
+    def get_statistics(self) -> Dict[str, float]:
+        """get statistics of skipped frames.
+
+        Returns:
+            Dict[str, float]: total and skipped frames and skip rate
+        """
+        skip_rate = 0.0
+        if self.frames_total > 0:
+            skip_rate = self.frames_skipped / self.frames_total
+        return {'frames_total': self.frames_total,
+                'frames_skipped': self.frames_skipped,
+                'skip_rate': skip_rate}
+
+
+    @staticmethod
+    def get_small_gray(img:cv2.typing.MatLike, scale:float) -> np.ndarray:
+        """get downscaled and blurred gray frame for comparison.
+
+        Args:
+            img (cv2.typing.MatLike): frame of camera
+            scale (float): scale of small frame
+
+        Returns:
+            np.ndarray: small gray frame
+        """
+        small = cv2.resize(img, None, fx=scale, fy=scale,
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+
+
+if __name__ == "__main__":
+    """Testing of change detector with camera"""
+    import handling_cameras
+    cam_op = handling_cameras.CameraOperator()
+    cam_op.open_camera_stream()
+    change_detector = ChangeDetector()
+    while True:
+        frame = cam_op.get_image_camera()
+        if frame is None:
+            break
+        print("changed" if change_detector.has_changed(frame) else "unchanged")
+        cv2.imshow("q: end", frame)
+        if cv2.waitKey(1) == ord('q'):
+            break
+    print(change_detector.get_statistics())
+    cam_op.close_camera_stream()
@@ -1,15 +1,50 @@
 import cv2
 import numpy as np
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
 from abc import ABC, abstractmethod
 
 from handling_configurations import ConfigReader,ConfigWriter
 
-BGR_COLORS = ConfigReader("config.json").get_value('BGR_COLORS', {})
+COLOR_UNKNOWN = 0
+
+
+@lru_cache(maxsize=None)
+def get_bgr_colors() -> Dict[str, List[int]]:
+    """get colors by name, read from config on first use.
+
+    Returns:
+        Dict[str, List[int]]: BGR values by color name
+    """
+    return ConfigReader("config.json").get_value('BGR_COLORS', {})
+
+
+@lru_cache(maxsize=None)
+def get_color_names() -> Tuple[str, ...]:
+    """get names of color codes, read from config on first use.
+
+    Returns:
+        Tuple[str, ...]: color code to name, unknown is ""
+    """
+    return ("",) + tuple(get_bgr_colors())
+
+
+def __getattr__(name:str) -> Any:
+    """Former module constants BGR_COLORS and COLOR_NAMES, read on access."""
+    if name == "BGR_COLORS":
+        return get_bgr_colors()
+    if name == "COLOR_NAMES":
+        return get_color_names()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class ColorDetector:
-    """Functions to detect color of shape"""
+    """Functions to detect color of shape. The mask buffer is reused for 
+    all shapes, so one detector must not be used by several threads."""
+    def __init__(self) -> None:
+        """Initialize ColorDetector"""
+        self._mask_buffer = np.zeros(0, dtype=np.uint8)
+    
     @abstractmethod
     def get_color(self, img:cv2.typing.MatLike, shape:List) -> str:
         """Identifying the color of the found shapes
@@ -21,17 +56,35 @@ class ColorDetector:
         Returns:
             str: str: The color of the shape. Empty string, if color is unkown.
         """        
-        # mask section and get mean value
-        mask = np.zeros(img.shape[:2], dtype="uint8")
-        mask = cv2.drawContours(mask, [shape], -1, 255, -1)
-        rgb_values_float = cv2.mean(img, mask=mask)[:3]
+        return get_color_names()[self.get_color_confidence(img, shape)[0]] # unkown color is ""
+    
+    
+    def get_color_confidence(self, img:cv2.typing.MatLike, 
+                             shape:List) -> Tuple[int, float]:
+        """Identifying the color of the found shapes and its confidence, 
+        i.e. the share of pixels of the shape within the hue range of the color.
+
+        Args:
+            img (cv2.typing.MatLike): The image with shapes
+            shape (List): Shapes found within the image
+
+        Returns:
+            Tuple[int, float]: The color code of the shape (see COLOR_NAMES) 
+                               and confidence between 0 and 1. 
+                               COLOR_UNKNOWN and 0, if color is unkown.
+        """        
+        # mask section within bounding box and get mean value
+        x, y, w, h = cv2.boundingRect(shape)
+        mask = self._get_mask(h, w)
+        mask = cv2.drawContours(mask, [shape], -1, 255, -1, offset=(-x, -y))
+        rgb_values_float = cv2.mean(img[y:y+h, x:x+w], mask=mask)[:3]
         rgb_values_int = np.array([[rgb_values_float]], dtype=np.uint8)
         
         # convert from RGB to HSV
         hsv_value = cv2.cvtColor(rgb_values_int, cv2.COLOR_BGR2HSV)
-        detected_color = ""
-        for name_color, values_color in BGR_COLORS.items():
-            limits_lower, limits_upper = ColorLimiter().get_limits_hsv(values_color)
+        color_limiter = ColorLimiter()
+        for color_code, values_color in enumerate(get_bgr_colors().values(), start=1):
+            limits_lower, limits_upper = color_limiter.get_limits_hsv(values_color)
             
             mask_color_lower = cv2.inRange(hsv_value, 
                                            limits_lower[0], limits_lower[1])
@@ -39,9 +92,32 @@ class ColorDetector:
                                            limits_upper[0], limits_upper[1])
             
             if (mask_color_lower>0) or (mask_color_upper>0):
-                detected_color = name_color
-                break
-        return detected_color # unkown color is ""
+                # share of pixels of shape within range of color
+                hsv_section = cv2.cvtColor(img[y:y+h, x:x+w], cv2.COLOR_BGR2HSV)
+                mask_color = cv2.bitwise_or(
+                    cv2.inRange(hsv_section, limits_lower[0], limits_lower[1]),
+                    cv2.inRange(hsv_section, limits_upper[0], limits_upper[1]))
+                pixels_color = cv2.countNonZero(cv2.bitwise_and(mask_color, mask))
+                confidence = pixels_color / max(1, cv2.countNonZero(mask))
+                return color_code, round(confidence, 3)
+        return COLOR_UNKNOWN, 0.0
+        
+    
+    def _get_mask(self, height:int, width:int) -> np.ndarray:
+        """get empty mask from buffer, which grows to the largest mask.
+
+        Args:
+            height (int): height of mask
+            width (int): width of mask
+
+        Returns:
+            np.ndarray: mask filled with zeros
+        """
+        if self._mask_buffer.size < height*width:
+            self._mask_buffer = np.empty(height*width, dtype=np.uint8)
+        mask = self._mask_buffer[:height*width].reshape(height, width)
+        mask.fill(0)
+        return mask
         
     
 class ColorLimiter:
@@ -51,10 +127,28 @@ class ColorLimiter:
         self._range_spectrum = 15
     
     
-    def get_limits_hsv(self, color_bgr:List[int])->Tuple:
+    @property
+    def range_spectrum(self) -> int:
+        """Hue range around hue of color, which counts as that color"""
+        return self._range_spectrum
+    
+    
+    def get_hue(self, color_bgr:List[int]) -> int:
+        """get hue of color.
+
+        Args:
+            color_bgr (List[int]): color in BGR
+
+        Returns:
+            int: hue of color (0 to 179)
+        """
         color = np.array([[color_bgr]], dtype=np.uint8)
         hsv_color = cv2.cvtColor(color, cv2.COLOR_BGR2HSV)
-        hue = hsv_color[0][0][0]
+        return int(hsv_color[0][0][0])
+    
+    
+    def get_limits_hsv(self, color_bgr:List[int])->Tuple:
+        hue = self.get_hue(color_bgr)
         hue_limits_lower = self._get_hue_limits_lower(int(hue))
         hue_limits_upper = self._get_hue_limits_upper(int(hue))
         limit_array_1 = self._get_hsv_limits(hue_limits_lower)
@@ -147,8 +241,9 @@ if __name__ == "__main__":
     
     print(f"WHITE color values: {BGR_COLORS['WHITE']}")
     
-    Detection.shape_recognition(shapes, img)
-    cv2.imshow("newimage", img)
+    from modificators_image import AnnotationRenderer
+    recognized = Detection.shape_recognition(shapes, img)
+    cv2.imshow("newimage", AnnotationRenderer.render(img, recognized))
 
     if cv2.waitKey() == ord('q'):
         cv2.destroyAllWindows()
\ No newline at end of file
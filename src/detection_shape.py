@@ -1,17 +1,355 @@
 import cv2
-from typing import List, Dict, Tuple
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, List, Dict, Optional, Sequence, Tuple
 from abc import abstractmethod
 
 from handling_configurations import ConfigReader
-from detection_color import ColorDetector
+from detection_color import ColorDetector, get_bgr_colors, get_color_names
 
-BGR_COLORS = ConfigReader("config.json").get_value('BGR_COLORS')
+DETECTION_VERSION = 6 # increase, if detection results change
+RATIO_IMAGE_TO_SHAPE = 100
+MINIMUM_SHAPES_PER_WORKER = 16
+
+
+@lru_cache(maxsize=None)
+def get_maximum_number_shapes() -> int:
+    """get maximum number of shapes, read from config on first use.
+
+    Returns:
+        int: config 'max_shapes', 0 for no limit
+    """
+    return ConfigReader("config.json").get_int('max_shapes', 0)
+
+
+@lru_cache(maxsize=None)
+def get_recognition_workers() -> int:
+    """get number of threads of recognition, read from config on first use.
+
+    Returns:
+        int: config 'recognition_workers', 0 for serial
+    """
+    return ConfigReader("config.json").get_int('recognition_workers', 0)
+
+
+def __getattr__(name:str) -> Any:
+    """Former module constants read from config, read on access."""
+    if name == "BGR_COLORS":
+        return get_bgr_colors()
+    if name == "MAXIMUM_NUMBER_SHAPES":
+        return get_maximum_number_shapes()
+    if name == "RECOGNITION_WORKERS":
+        return get_recognition_workers()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class ShapeCode(IntEnum):
+    """Codes of recognized shapes"""
+    TRIANGLE = 0
+    SQUARE = 1
+    RECTANGLE = 2
+    PENTAGON = 3
+    HEXAGON = 4
+    CIRCLE = 5
+    UNKNOWN = 6
+
+SHAPE_NAMES = ("Triangle", "Square", "Rectangle", "Pentagon", "Hexagon", "Circle", 
+               "Unknown")
+
+
+class DetectedShape:
+    """Recognized shape within an image. Shape and color are stored as codes, 
+    names are looked up in SHAPE_NAMES and COLOR_NAMES for output only."""
+    __slots__ = ('shape_code', 'color_code', 'center', 'bbox', 'area', 
+                 'vertices', 'confidence', 'contour', 'track_id')
+    
+    def __init__(self, shape_code:int, color_code:int, center:Tuple[int, int], 
+                 bbox:Tuple[int, int, int, int], area:float=0.0, 
+                 vertices:int=0, confidence:float=0.0, 
+                 contour:Optional[cv2.typing.MatLike]=None, 
+                 track_id:Optional[int]=None) -> None:
+        """Initialize detected shape
+
+        Args:
+            shape_code (int): Code of shape, see ShapeCode
+            color_code (int): Code of color, see COLOR_NAMES. 0, if unknown.
+            center (Tuple[int, int]): Center of shape (x, y)
+            bbox (Tuple[int, int, int, int]): Bounding box (x, y, w, h)
+            area (float, optional): Area in pixels. Defaults to 0.0.
+            vertices (int, optional): Number of polygon vertices. Defaults to 0.
+            confidence (float, optional): Confidence of shape and color 
+                                          between 0 and 1. Defaults to 0.0.
+            contour (Optional[cv2.typing.MatLike], optional): Contour of shape. 
+                                          Defaults to None.
+            track_id (Optional[int], optional): Id of track, if tracked. 
+                                          Defaults to None.
+        """
+        self.shape_code = shape_code
+        self.color_code = color_code
+        self.center = center
+        self.bbox = bbox
+        self.area = area
+        self.vertices = vertices
+        self.confidence = confidence
+        self.contour = contour
+        self.track_id = track_id
+    
+    @property
+    def pattern(self) -> str:
+        """Name of shape"""
+        return SHAPE_NAMES[self.shape_code]
+    
+    @property
+    def color(self) -> str:
+        """Name of color. Empty, if unknown."""
+        return get_color_names()[self.color_code]
+    
+    def translate(self, x_offset:int, y_offset:int) -> None:
+        """Moves shape, e.g. from image region into image coordinates.
+
+        Args:
+            x_offset (int): offset in x
+            y_offset (int): offset in y
+        """
+        self.center = (self.center[0]+x_offset, self.center[1]+y_offset)
+        self.bbox = (self.bbox[0]+x_offset, self.bbox[1]+y_offset, 
+                     self.bbox[2], self.bbox[3])
+        if self.contour is not None:
+            self.contour = self.contour + np.array([x_offset, y_offset], 
+                                                   dtype=self.contour.dtype)
+    
+    def scale(self, factor:float) -> None:
+        """Scales shape, e.g. from downscaled image into image coordinates.
+
+        Args:
+            factor (float): scale factor
+        """
+        self.center = (int(self.center[0]*factor), int(self.center[1]*factor))
+        self.bbox = tuple(int(value*factor) for value in self.bbox)
+        self.area = self.area*factor*factor
+        if self.contour is not None:
+            self.contour = (self.contour*factor).astype(self.contour.dtype)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Converts shape into serializable dictionary (without contour).
+
+        Returns:
+            Dict[str, Any]: shape as dictionary
+        """
+        return {'shape_code': int(self.shape_code), 'color_code': self.color_code, 
+                'center': list(self.center), 'bbox': list(self.bbox), 
+                'area': self.area, 'vertices': self.vertices, 
+                'confidence': self.confidence, 'track_id': self.track_id}
+    
+    @classmethod
+    def from_dict(cls, data:Dict[str, Any]) -> "DetectedShape":
+        """Creates shape from dictionary.
+
+        Args:
+            data (Dict[str, Any]): shape as dictionary
+
+        Returns:
+            DetectedShape: shape
+        """
+        return cls(ShapeCode(data['shape_code']), data['color_code'], 
+                   tuple(data['center']), 
+                   tuple(data['bbox']), data.get('area', 0.0), 
+                   data.get('vertices', 0), data.get('confidence', 0.0), 
+                   None, data.get('track_id'))
+
+
+class ShapeArray:
+    """Functions for per-frame results as NumPy structured array"""
+    DTYPE = np.dtype([('shape_code', np.uint8), ('color_code', np.uint8),
+                      ('center', np.int32, 2), ('bbox', np.int32, 4),
+                      ('area', np.float32), ('vertices', np.uint16),
+                      ('confidence', np.float32), ('track_id', np.int32)])
+    
+    @staticmethod
+    def from_shapes(shapes:List[DetectedShape]) -> np.ndarray:
+        """Converts recognized shapes into structured array.
+
+        Args:
+            shapes (List[DetectedShape]): recognized shapes of one frame
+
+        Returns:
+            np.ndarray: one row per shape, track id is -1 if not tracked
+        """
+        array = np.empty(len(shapes), dtype=ShapeArray.DTYPE)
+        for index, shape in enumerate(shapes):
+            array[index] = (shape.shape_code, shape.color_code, shape.center, 
+                            shape.bbox, shape.area, shape.vertices, 
+                            shape.confidence, 
+                            -1 if shape.track_id is None else shape.track_id)
+        return array
+    
+    @staticmethod
+    def count_shapes_colors(array:np.ndarray) -> np.ndarray:
+        """Counts shapes per shape and color.
+
+        Args:
+            array (np.ndarray): structured array of shapes
+
+        Returns:
+            np.ndarray: counts with shape (len(SHAPE_NAMES), len(COLOR_NAMES)),
+                        indexed by shape code and color code
+        """
+        number_colors = len(get_color_names())
+        index = (array['shape_code'].astype(np.intp)*number_colors 
+                 + array['color_code'])
+        counts = np.bincount(index, minlength=len(SHAPE_NAMES)*number_colors)
+        return counts.reshape(len(SHAPE_NAMES), number_colors)
+    
+    @staticmethod
+    def get_count_names(counts:np.ndarray) -> Dict[Tuple[str, str], int]:
+        """Converts counts into names for output.
+
+        Args:
+            counts (np.ndarray): counts by shape code and color code
+
+        Returns:
+            Dict[Tuple[str, str], int]: non-zero counts by (shape, color)
+        """
+        shape_codes, color_codes = np.nonzero(counts)
+        color_names = get_color_names()
+        return {(SHAPE_NAMES[shape_code], color_names[color_code]): 
+                int(counts[shape_code, color_code])
+                for shape_code, color_code in zip(shape_codes, color_codes)}
+
+
+class ShapeFeatures:
+    """Features of contours for classification, computed for all contours 
+    at once into a NumPy structured array and classified by vectorized 
+    rules. Polygons must be convex, curved shapes must also be round to 
+    count as circle, everything else is unknown."""
+    DTYPE = np.dtype([('vertices', np.uint16), ('area', np.float64),
+                      ('area_polygon', np.float64), ('aspect_ratio', np.float64),
+                      ('circularity', np.float64), ('solidity', np.float64)])
+    EPSILON_POLYGON = 0.01 # tolerance of polygon relative to perimeter
+    TOLERANCE_SQUARE = 0.05 # maximum deviation of aspect ratio from 1
+    TOLERANCE_CIRCLE = 0.25
+    MINIMUM_CIRCULARITY = 0.8 # 4*pi*A/P^2 is 1 for circles, 0.91 for hexagons
+    MINIMUM_SOLIDITY = 0.9 # area relative to convex hull
+    
+    @staticmethod
+    def from_shapes(shapes:Sequence[cv2.typing.MatLike]) -> np.ndarray:
+        """Computes features of all shapes. Measurements of each shape are 
+        taken by OpenCV in one pass, ratios are computed for all shapes at 
+        once.
+
+        Args:
+            shapes (Sequence[cv2.typing.MatLike]): Shapes as contours
+
+        Returns:
+            np.ndarray: one row per shape
+        """
+        measurements = np.zeros((len(shapes), 6))
+        for index, shape in enumerate(shapes):
+            perimeter = cv2.arcLength(shape, True)
+            polygon = cv2.approxPolyDP(shape, ShapeFeatures.EPSILON_POLYGON*perimeter, True)
+            _, _, width, height = cv2.boundingRect(polygon)
+            measurements[index] = (len(polygon), cv2.contourArea(shape), 
+                                   cv2.contourArea(polygon), width/height, perimeter, 
+                                   cv2.contourArea(cv2.convexHull(polygon)))
+        
+        features = np.zeros(len(shapes), dtype=ShapeFeatures.DTYPE)
+        features['vertices'] = measurements[:, 0]
+        features['area'] = measurements[:, 1]
+        features['area_polygon'] = measurements[:, 2]
+        features['aspect_ratio'] = measurements[:, 3]
+        features['circularity'] = (4*np.pi*measurements[:, 1] / 
+                                   np.maximum(measurements[:, 4]**2, 1e-6))
+        features['solidity'] = measurements[:, 1] / np.maximum(measurements[:, 5], 1e-6)
+        return features
+    
+    @staticmethod
+    def classify(features:np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Classification of shapes by their features.
+
+        Args:
+            features (np.ndarray): features of shapes, see from_shapes
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 
+                - [0] codes of shapes, see ShapeCode
+                - [1] confidences of shapes between 0 and 1. Circularity for 
+                      circles, area match of contour and polygon otherwise.
+        """
+        vertices = features['vertices']
+        aspect_deviation = np.abs(np.log(features['aspect_ratio']))
+        convex = features['solidity'] >= ShapeFeatures.MINIMUM_SOLIDITY
+        circle = (convex & (vertices >= 7) & 
+                  (features['circularity'] >= ShapeFeatures.MINIMUM_CIRCULARITY) &
+                  (aspect_deviation <= np.log1p(ShapeFeatures.TOLERANCE_CIRCLE)))
+        square = aspect_deviation <= np.log1p(ShapeFeatures.TOLERANCE_SQUARE)
+        shape_codes = np.select(
+            [convex & (vertices == 3), convex & (vertices == 4) & square, 
+             convex & (vertices == 4), convex & (vertices == 5), 
+             convex & (vertices == 6), circle],
+            [ShapeCode.TRIANGLE, ShapeCode.SQUARE, ShapeCode.RECTANGLE, 
+             ShapeCode.PENTAGON, ShapeCode.HEXAGON, ShapeCode.CIRCLE],
+            ShapeCode.UNKNOWN).astype(np.uint8)
+        
+        area_match = (np.minimum(features['area'], features['area_polygon']) / 
+                      np.maximum(np.maximum(features['area'], features['area_polygon']), 1e-6))
+        confidences = np.where(shape_codes == ShapeCode.CIRCLE, 
+                               np.minimum(features['circularity'], 1.0), area_match)
+        return shape_codes, confidences
+
+
+class DetectionBuffers:
+    """Scratch images of shape detection and mask of color detection, 
+    reused for all frames of a stream. Images are allocated again only, if 
+    the resolution changes. Buffers must not be used by several threads."""
+    def __init__(self) -> None:
+        """Initialize DetectionBuffers"""
+        self.gray: Optional[np.ndarray] = None
+        self.blurred: Optional[np.ndarray] = None
+        self.thresholded: Optional[np.ndarray] = None
+        self.color_detector = ColorDetector()
+        self.allocations = 0
+    
+    def prepare(self, shape_img:Tuple) -> None:
+        """Allocates scratch images for resolution of image, if needed.
+
+        Args:
+            shape_img (Tuple): shape of image
+        """
+        if self.gray is not None and self.gray.shape == shape_img[:2]:
+            return
+        self.gray = np.empty(shape_img[:2], dtype=np.uint8)
+        self.blurred = np.empty_like(self.gray)
+        self.thresholded = np.empty_like(self.gray)
+        self.allocations += 1
 
 
 class Detection:
     """Functions to detect shape and recognize it"""
+    _executor: Optional[ThreadPoolExecutor] = None # shared by all recognitions
+    _executor_workers = 0
+    _executor_lock = threading.Lock()
+    _replaced_executors: List[ThreadPoolExecutor] = [] # may still be used, kept until exit
+    
+    @staticmethod
+    def get_parameters() -> Dict:
+        """get all parameters, which affect the detection results.
+
+        Returns:
+            Dict: parameters of detection
+        """
+        return {'version': DETECTION_VERSION,
+                'BGR_COLORS': get_bgr_colors(),
+                'ratio_image_to_shape': RATIO_IMAGE_TO_SHAPE,
+                'maximum_number_shapes': get_maximum_number_shapes()}
+    
     @abstractmethod
-    def shape_detection(img:cv2.typing.MatLike, ratio_image_to_shape:int=100) -> List:
+    def shape_detection(img:cv2.typing.MatLike, 
+                        ratio_image_to_shape:int=RATIO_IMAGE_TO_SHAPE,
+                        maximum_number_shapes:Optional[int]=None,
+                        buffers:Optional[DetectionBuffers]=None) -> List:
         """Shape detection from the image
 
         Args:
@@ -19,83 +357,152 @@ class Detection:
             ratio_image_to_shape (float): Ratio of image to shape, i.e. 
                                           how many times the image is bigger 
                                           than the shape. Defaults to 100.
+            maximum_number_shapes (int): Maximum number of shapes, largest 
+                                         are kept. Defaults to config 
+                                         'max_shapes', 0 for no limit.
+            buffers (Optional[DetectionBuffers]): Scratch images, reused 
+                                         for frames of same resolution. 
+                                         Defaults to None, new images.
 
         Returns:
-            List: The shapes within the image
+            List: The shapes within the image, largest first
         """
-        gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) 
+        if maximum_number_shapes is None:
+            maximum_number_shapes = get_maximum_number_shapes()
+        if buffers is None:
+            buffers = DetectionBuffers()
+        buffers.prepare(img.shape)
+        gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=buffers.gray) 
         area_of_img = gray_img.shape[0]*gray_img.shape[1]
         minimum_area_for_shape = int(area_of_img/ratio_image_to_shape)
 
-        blurred = cv2.GaussianBlur(gray_img, (5, 5), 0)
-        thresholded = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+        blurred = cv2.GaussianBlur(gray_img, (5, 5), 0, dst=buffers.blurred)
+        thresholded = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2, 
+                                            dst=buffers.thresholded)
         
-        contours, _ = cv2.findContours(thresholded, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        found_shapes = sorted(contours, key=cv2.contourArea, reverse=True)[1:] # excluding background
+        contours, hierarchy = cv2.findContours(thresholded, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+        found_shapes = FilterShapes.shape_outlines(contours, hierarchy)
         
-        filtered_shapes = FilterShapes.minimum_shape_size(found_shapes, 
-                                                          minimum_area_for_shape)
+        filtered_shapes = FilterShapes.largest_shapes(found_shapes, 
+                                                      minimum_area_for_shape,
+                                                      maximum_number_shapes)
         filtered_shapes = FilterShapes.minimum_center_distance(filtered_shapes,
                                                                miniumum_distance=2)
         
-        if False: # Debugging 
-            cv2.imshow("gray", gray_img)
-            cv2.imshow("blurred", blurred)
-            cv2.imshow("thresholded", thresholded)
-            img_contours = cv2.drawContours(img, filtered_found_shapes, -1, (120, 255, 0), 1)
-            cv2.imshow("Contours", img_contours)
-            print(len(contours))
-            print(len(found_shapes))
-            print(len(filtered_found_shapes))
-        
         return filtered_shapes 
 
     @abstractmethod
-    def shape_recognition(found_shapes:List, img:cv2.typing.MatLike) -> List[Dict[str, str]]:
-        """Identification of found shapes
+    def shape_recognition(found_shapes:List, img:cv2.typing.MatLike,
+                          workers:Optional[int]=None,
+                          buffers:Optional[DetectionBuffers]=None) -> List[DetectedShape]:
+        """Identification of found shapes. The image is not modified, 
+        see AnnotationRenderer for drawing the results.
+        
+        With several workers, found shapes are split into consecutive chunks,
+        which are recognized by a shared thread pool (OpenCV releases the 
+        GIL) and joined in order again.
 
         Args:
             found_shapes (List): List of found shapes within the image
             img (cv2.typing.MatLike): The image with shapes
+            workers (int, optional): Number of threads. Defaults to config 
+                                     'recognition_workers', 0 for serial.
+            buffers (Optional[DetectionBuffers]): Buffers of calling thread, 
+                                     used for serial recognition only.
+                                     Defaults to None.
             
         Returns:
-            List[Dict[str, str]]: List of recognized shapes with pattern and color
+            List[DetectedShape]: List of recognized shapes in order of found shapes
         """
-        recognized_shapes = []  # List to store recognized shapes
-        for shape in found_shapes:            
-            define_shape = cv2.approxPolyDP(shape, 0.01 * cv2.arcLength(shape, True), True)
-            shape_color = ColorDetector().get_color(img, shape)
-            shape_name = "Circle"
-            
-            if len(define_shape) == 3:
-                shape_name = "Triangle"
-            
-            if len(define_shape) == 4:
-                (x1, y1, w, h) = cv2.boundingRect(define_shape)
-                aspect_ratio = float(w) / h
-                if 0.95 <= aspect_ratio <= 1.05:
-                    shape_name = "Square"
-                else:
-                    shape_name = "Rectangle"
-            
-            if len(define_shape) == 5:
-                shape_name = "Pentagon"
-            
-            if len(define_shape) == 6:
-                shape_name = "Hexagon"
-            
-            
-            cv2.drawContours(img, [shape], 0, BGR_COLORS["CYAN"], 5)
+        if workers is None:
+            workers = get_recognition_workers()
+        number_chunks = min(workers, len(found_shapes) // MINIMUM_SHAPES_PER_WORKER)
+        if number_chunks <= 1:
+            return Detection.recognize_shapes(found_shapes, img, buffers)
+        
+        bounds = np.linspace(0, len(found_shapes), number_chunks+1).astype(int)
+        results = Detection.get_executor(workers).map(
+            lambda chunk: Detection.recognize_shapes(found_shapes[chunk[0]:chunk[1]], img),
+            zip(bounds[:-1], bounds[1:]))
+        return [shape for chunk in results for shape in chunk]
+    
+    @staticmethod
+    def get_executor(workers:int) -> ThreadPoolExecutor:
+        """Get shared thread pool of detection with at least workers threads.
+        Tasks on the pool must not wait for other tasks on the pool. A pool 
+        replaced by a larger one is not shut down, as other threads may 
+        still submit tasks to it.
+
+        Args:
+            workers (int): Number of threads
+
+        Returns:
+            ThreadPoolExecutor: Thread pool of detection
+        """
+        with Detection._executor_lock:
+            if Detection._executor_workers < workers:
+                if Detection._executor is not None:
+                    Detection._replaced_executors.append(Detection._executor)
+                Detection._executor = ThreadPoolExecutor(workers, "detection")
+                Detection._executor_workers = workers
+            return Detection._executor
+    
+    @staticmethod
+    def recognize_shapes(found_shapes:Sequence[cv2.typing.MatLike], 
+                         img:cv2.typing.MatLike,
+                         buffers:Optional[DetectionBuffers]=None) -> List[DetectedShape]:
+        """Identification of found shapes in this thread.
+
+        Args:
+            found_shapes (Sequence[cv2.typing.MatLike]): Found shapes
+            img (cv2.typing.MatLike): The image with shapes
+            buffers (Optional[DetectionBuffers]): Buffers of this thread. 
+                                                  Defaults to None.
             
-            text = f'{shape_name}, {shape_color}'
-            coords_text = OperationShapes.get_shape_center(shape)
-            img = TextPlacer.place_text(img, text, coords_text)
+        Returns:
+            List[DetectedShape]: List of recognized shapes in order of found shapes
+        """
+        recognized_shapes = []  # List to store recognized shapes
+        color_detector = buffers.color_detector if buffers else ColorDetector()
+        features = ShapeFeatures.from_shapes(found_shapes)
+        shape_codes, shape_confidences = ShapeFeatures.classify(features)
+        for index, shape in enumerate(found_shapes):            
+            color_code, color_confidence = color_detector.get_color_confidence(img, shape)
             
-            recognized_shapes.append({'pattern': shape_name, 'color': shape_color})
+            recognized_shapes.append(DetectedShape(
+                ShapeCode(shape_codes[index]), color_code, 
+                OperationShapes.get_shape_center(shape), cv2.boundingRect(shape),
+                float(features['area'][index]), int(features['vertices'][index]), 
+                round(float(shape_confidences[index])*color_confidence, 3), shape))
         return recognized_shapes
     
 
 class FilterShapes:
+    @staticmethod
+    def shape_outlines(contours:Sequence[cv2.typing.MatLike], 
+                       hierarchy:Optional[np.ndarray]
+                       )->List[cv2.typing.MatLike]:
+        """
+        Select one contour per shape from contours of RETR_CCOMP.
+        Shapes are enclosed by dark edge lines in the thresholded image. 
+        The outer side of an edge line is a hole of the surrounding bright 
+        region (second level), its inner side the outer boundary of the 
+        bright region within the shape (first level, like the background). 
+        Only holes are kept, so each shape appears once and the background 
+        is excluded.
+        
+        Args:
+            contours (Sequence[cv2.typing.MatLike]): contours of RETR_CCOMP
+            hierarchy (Optional[np.ndarray]): hierarchy of contours
+
+        Returns:
+            List[cv2.typing.MatLike]: outlines of shapes. Empty, otherwise.
+        """
+        if hierarchy is None:
+            return []
+        return [contour for contour, (_, _, _, parent) in zip(contours, hierarchy[0])
+                if parent != -1]
+    
     @staticmethod
     def minimum_shape_size(found_shapes:List[cv2.typing.MatLike], 
                                   minimum_area_for_shape:int
@@ -109,15 +516,38 @@ class FilterShapes:
             miniumum_area_for_shape (int): required minimum area of shape
 
         Returns:
-            List[cv2.typing.MatLike]: List of filtered shapes. Empty, otherwise.
+            List[cv2.typing.MatLike]: List of filtered shapes, largest first. 
+                                      Empty, otherwise.
         """
-        filtered_found_shapes = []
-        for shape in found_shapes:
-            area = cv2.contourArea(shape)
-            if minimum_area_for_shape > area:
-                break
-            filtered_found_shapes.append(shape)
-        return filtered_found_shapes
+        return FilterShapes.largest_shapes(found_shapes, minimum_area_for_shape)
+    
+    @staticmethod
+    def largest_shapes(found_shapes:Sequence[cv2.typing.MatLike], 
+                       minimum_area_for_shape:int,
+                       maximum_number_shapes:int=0
+                       )->List[cv2.typing.MatLike]:
+        """
+        Select largest shapes. Areas are computed once for all shapes, 
+        smaller shapes are removed before sorting and only the largest 
+        maximum number of shapes are sorted.
+        
+        Args:
+            found_shapes (Sequence[cv2.typing.MatLike]): Shapes in any order
+            minimum_area_for_shape (int): required minimum area of shape
+            maximum_number_shapes (int, optional): Maximum number of shapes. 
+                                                   Defaults to 0, no limit.
+
+        Returns:
+            List[cv2.typing.MatLike]: List of filtered shapes, largest first. 
+                                      Empty, otherwise.
+        """
+        areas = OperationShapes.get_shape_areas(found_shapes)
+        selected = np.flatnonzero(areas >= minimum_area_for_shape)
+        if 0 < maximum_number_shapes < len(selected):
+            largest = np.argpartition(-areas[selected], maximum_number_shapes-1)
+            selected = selected[largest[:maximum_number_shapes]]
+        selected = selected[np.argsort(-areas[selected], kind="stable")]
+        return [found_shapes[index] for index in selected]
     
     @staticmethod
     def minimum_center_distance(found_shapes:List[cv2.typing.MatLike], 
@@ -135,7 +565,7 @@ class FilterShapes:
             List[cv2.typing.MatLike]: List of filtered shapes. Empty, otherwise.
         """
         filtered_found_shapes = []
-        center_points = [(0,0)]
+        center_points = []
         
         for shape in found_shapes:
             center_point_new = OperationShapes.get_shape_center(shape)
@@ -144,7 +574,7 @@ class FilterShapes:
             for center in center_points:
                 x_delta = abs(center[0]-center_point_new[0])
                 y_delta = abs(center[1]-center_point_new[1])
-                if (x_delta <= miniumum_distance) or (y_delta <= miniumum_distance):
+                if (x_delta <= miniumum_distance) and (y_delta <= miniumum_distance):
                     center_exists = True
             
             if center_exists == True:
@@ -155,6 +585,30 @@ class FilterShapes:
 
 
 class OperationShapes:
+    @staticmethod
+    def get_shape_areas(shapes:Sequence[cv2.typing.MatLike])->np.ndarray:
+        """Get areas of all shapes at once (shoelace formula, like 
+        cv2.contourArea).
+
+        Args:
+            shapes (Sequence[cv2.typing.MatLike]): Shapes as contours
+
+        Returns:
+            np.ndarray: Areas of shapes in pixels.
+        """
+        if len(shapes) == 0:
+            return np.zeros(0)
+        lengths = np.fromiter((len(shape) for shape in shapes), dtype=np.intp, 
+                              count=len(shapes))
+        points = np.concatenate(shapes).reshape(-1, 2).astype(np.float64)
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        following = np.arange(1, len(points)+1)
+        following[ends-1] = starts # close each contour
+        cross = (points[:, 0]*points[following, 1] - 
+                 points[following, 0]*points[:, 1])
+        return np.abs(np.add.reduceat(cross, starts)) / 2
+    
     @staticmethod
     def get_shape_center(shape:cv2.typing.MatLike)->Tuple[int, int]:
         """Get center of shape.
@@ -192,7 +646,7 @@ class TextPlacer:
         font = {
                 'face' : cv2.FONT_HERSHEY_SIMPLEX,
                 'scale' : 0.8,
-                'color' : BGR_COLORS["BLACK"],
+                'color' : get_bgr_colors()["BLACK"],
                 'thickness' : 2
             }
         text_size, baseline = cv2.getTextSize(text, font["face"], font["scale"], font["thickness"])
@@ -212,8 +666,11 @@ if __name__ == "__main__":
     shapes = Detection.shape_detection(img)
     print(len(shapes))
 
-    Detection.shape_recognition(shapes, img)
-    cv2.imshow("newimage", img)
+    from modificators_image import AnnotationRenderer
+    recognized = Detection.shape_recognition(shapes, img)
+    print(ShapeArray.get_count_names(
+        ShapeArray.count_shapes_colors(ShapeArray.from_shapes(recognized))))
+    cv2.imshow("newimage", AnnotationRenderer.render(img, recognized))
 
     if cv2.waitKey() == ord('q'):
         cv2.destroyAllWindows()
@@ -0,0 +1,235 @@
+"""Module for live statistics of detected shapes over time windows."""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from detection_shape import DetectedShape, ShapeArray, SHAPE_NAMES
+from detection_color import get_color_names
+
+
+class DetectionStatistics:
+    """Rolling counts of shapes per shape and color.
+
+    Counts are kept in a ring of time buckets, so counts of any window up to
+    the longest one are summed from the last buckets. Counts since the last
+    flush are appended to a summary file as one JSON line.
+    """
+    def __init__(self, _windows:Sequence[float]=(60, 600),
+                 _path_summary:str="", _flush_interval:float=60,
+                 _bucket_seconds:float=1.0) -> None:
+        """Initialize detection statistics
+
+        Args:
+            _windows (Sequence[float], optional): lengths of windows in
+                                seconds. Defaults to (60, 600).
+            _path_summary (str, optional): path of summary file. Defaults to
+                                "", no summary file.
+            _flush_interval (float, optional): seconds between two flushes of
+                                summary file. Defaults to 60.
+            _bucket_seconds (float, optional): length of one time bucket in
+                                seconds. Defaults to 1.0.
+        """
+        self.windows = sorted(float(window) for window in _windows if window > 0) or [60.0]
+        self.path_summary = _path_summary
+        self.flush_interval = _flush_interval
+        self.bucket_seconds = max(0.01, _bucket_seconds)
+
+        number_buckets = int(np.ceil(self.windows[-1] / self.bucket_seconds))
+        number_colors = len(get_color_names())
+        self._buckets = np.zeros((number_buckets, len(SHAPE_NAMES), number_colors),
+                                 dtype=np.int64)
+        self._totals = np.zeros((len(SHAPE_NAMES), number_colors), dtype=np.int64)
+        self._since_flush = np.zeros_like(self._totals)
+        self._last_bucket: Optional[int] = None
+        self._time_flush = time.monotonic()
+        self._datetime_flush = datetime.now()
+        self._lock = threading.Lock()
+
+
+    def add_shapes(self, shapes:List[DetectedShape],
+                   timestamp:Optional[float]=None) -> None:
+        """adds recognized shapes of one frame.
+
+        Args:
+            shapes (List[DetectedShape]): recognized shapes
+            timestamp (Optional[float], optional): time.monotonic() of frame.
+                                                   Defaults to None, now.
+        """
+        if not shapes:
+            return
+        counts = ShapeArray.count_shapes_colors(ShapeArray.from_shapes(shapes))
+        with self._lock:
+            bucket = self._advance(timestamp)
+            self._buckets[bucket % len(self._buckets)] += counts
+            self._totals += counts
+            self._since_flush += counts
+
+
+    def get_window_counts(self, window:float,
+                          timestamp:Optional[float]=None) -> np.ndarray:
+        """get counts of last window.
+
+        Args:
+            window (float): length of window in seconds, at most longest window
+            timestamp (Optional[float], optional): end of window.
+                                                   Defaults to None, now.
+
+        Returns:
+            np.ndarray: counts indexed by shape code and color code
+        """
+        with self._lock:
+            bucket = self._advance(timestamp)
+            number_buckets = min(len(self._buckets),
+                                 max(1, int(np.ceil(window / self.bucket_seconds))))
+            indices = np.arange(bucket-number_buckets+1, bucket+1) % len(self._buckets)
+            return self._buckets[indices].sum(axis=0)
+
+
+    def get_totals(self) -> np.ndarray:
+        """get counts since start.
+
+        Returns:
+            np.ndarray: counts indexed by shape code and color code
+        """
+        with self._lock:
+            return self._totals.copy()
+
+
+    def get_summary_text(self, max_entries:int=5) -> str:
+        """get text of most frequent shapes per window and since start, 
+        e.g. for GUI.
+
+        Args:
+            max_entries (int, optional): maximum number of shapes per line.
+                                         Defaults to 5.
+
+        Returns:
+            str: one line per window and one line since start
+        """
+        lines = [f"Last {window:g} s: "
+                 f"{self._get_counts_text(self.get_window_counts(window), max_entries)}"
+                 for window in self.windows]
+        lines.append(f"Since start: {self._get_counts_text(self.get_totals(), max_entries)}")
+        return "\n".join(lines)
+
+
+    def flush_if_due(self) -> bool:
+        """flushes summary, if flush interval passed.
+
+        Returns:
+            bool: True, if flushed. False, otherwise.
+        """
+        if time.monotonic() - self._time_flush < self.flush_interval:
+            return False
+        return self.flush()
+
+
+    def flush(self) -> bool:
+        """appends counts since last flush to summary file.
+
+        Returns:
+            bool: True, if successful. False, otherwise.
+        """
+        with self._lock:
+            counts = self._since_flush.copy()
+            self._since_flush[:] = 0
+            datetime_start = self._datetime_flush
+            self._datetime_flush = datetime.now()
+            self._time_flush = time.monotonic()
+        if not self.path_summary:
+            return True
+
+        summary = {'start': datetime_start.isoformat(timespec='seconds'),
+                   'end': self._datetime_flush.isoformat(timespec='seconds'),
+                   'total': int(counts.sum()),
+                   'counts': self._get_nested_names(counts)}
+        try:
+            directory = os.path.dirname(self.path_summary)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path_summary, "a", encoding="utf-8") as file:
+                file.write(json.dumps(summary, separators=(",", ":")) + "\n")
+        except OSError as e:
+            print(f"ERROR: Cannot write statistics summary: \n{e}")
+            return False
+        return True
+
+
+    def _advance(self, timestamp:Optional[float]=None) -> int:
+        """moves to bucket of timestamp and clears expired buckets.
+        Lock must be held.
+
+        Args:
+            timestamp (Optional[float], optional): time.monotonic().
+                                                   Defaults to None, now.
+
+        Returns:
+            int: current bucket number
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        bucket = int(timestamp // self.bucket_seconds)
+        if self._last_bucket is None:
+            self._last_bucket = bucket
+        elif bucket > self._last_bucket:
+            if bucket - self._last_bucket >= len(self._buckets):
+                self._buckets[:] = 0
+            else:
+                expired = np.arange(self._last_bucket+1, bucket+1) % len(self._buckets)
+                self._buckets[expired] = 0
+            self._last_bucket = bucket
+        return self._last_bucket
+
+
+    @staticmethod
+    def _get_counts_text(counts:np.ndarray, max_entries:int) -> str:
+        """converts counts into text of most frequent shapes.
+
+        Args:
+            counts (np.ndarray): counts indexed by shape code and color code
+            max_entries (int): maximum number of shapes
+
+        Returns:
+            str: most frequent shapes, "-" if there are none
+        """
+        count_names = ShapeArray.get_count_names(counts)
+        entries = sorted(count_names.items(), key=lambda item: item[1], reverse=True)
+        text = ", ".join(f"{count} {color or 'Unknown'} {pattern}"
+                         for (pattern, color), count in entries[:max_entries])
+        return text or "-"
+
+
+    @staticmethod
+    def _get_nested_names(counts:np.ndarray) -> Dict[str, Dict[str, int]]:
+        """converts counts into names for summary file.
+
+        Args:
+            counts (np.ndarray): counts indexed by shape code and color code
+
+        Returns:
+            Dict[str, Dict[str, int]]: non-zero counts by shape and color
+        """
+        nested: Dict[str, Dict[str, int]] = {}
+        for (pattern, color), count in ShapeArray.get_count_names(counts).items():
+            nested.setdefault(pattern, {})[color or "Unknown"] = count
+        return nested
+
+
+
+if __name__ == "__main__":
+    """Testing of detection statistics"""
+    import cv2
+    from detection_shape import Detection
+    img = cv2.imread(R"in/test_image_01.png")
+    recognized = Detection.shape_recognition(Detection.shape_detection(img), img)
+    statistics = DetectionStatistics(_windows=(1, 5), _path_summary="")
+    for _ in range(3):
+        statistics.add_shapes(recognized)
+        time.sleep(0.5)
+    print(statistics.get_summary_text())
@@ -0,0 +1,348 @@
+"""Module for detecting shapes in very large images tile by tile."""
+
+import os
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from detection_shape import (Detection, DetectedShape, RATIO_IMAGE_TO_SHAPE,
+                             get_maximum_number_shapes)
+from modificators_image import PictureModifications
+
+TILE_BORDER_MARGIN = 8 # pixels at inner tile borders, within which shapes may be cut off
+MERGE_CENTER_DISTANCE = 4 # maximum center distance in pixels of duplicates
+MERGE_MINIMUM_OVERLAP = 0.5 # minimum bounding box overlap of duplicates
+
+
+class TiledDetection:
+    """Detection of shapes in overlapping tiles of an image.
+
+    Tiles are views into the image, so gray, blurred and thresholded images
+    only exist per tile and memory per worker depends on the tile size only.
+    Tiles are detected in parallel on the shared thread pool of Detection.
+    Shapes within overlaps are found twice and merged by center and bounding 
+    box. Shapes cut off at inner tile borders have open outlines and are not
+    found in any tile. They are found in the image scaled down to the tile 
+    size instead and detected again at full resolution in a region around 
+    them, which grows until the shape is complete.
+    """
+    @staticmethod
+    def shape_detection_recognition(img:cv2.typing.MatLike, tile_size:int=4096,
+                                    overlap:int=256, workers:int=0,
+                                    ratio_image_to_shape:int=RATIO_IMAGE_TO_SHAPE,
+                                    maximum_number_shapes:Optional[int]=None
+                                    ) -> List[DetectedShape]:
+        """Detection and identification of shapes tile by tile.
+
+        Args:
+            img (cv2.typing.MatLike): The image with shapes
+            tile_size (int, optional): Length of tile sides. Defaults to 4096.
+            overlap (int, optional): Minimum overlap of neighboring tiles. 
+                                     Defaults to 256.
+            workers (int, optional): Number of threads. Defaults to 0, one
+                                     per core.
+            ratio_image_to_shape (int, optional): Ratio of image to shape,
+                                     i.e. how many times the image is bigger
+                                     than the shape. Defaults to 100.
+            maximum_number_shapes (int, optional): Maximum number of shapes,
+                                     largest are kept. Defaults to config
+                                     'max_shapes', 0 for no limit.
+
+        Returns:
+            List[DetectedShape]: recognized shapes in image coordinates,
+                                 largest first
+        """
+        if maximum_number_shapes is None:
+            maximum_number_shapes = get_maximum_number_shapes()
+        tiles = TiledDetection.get_tiles(img.shape, tile_size, overlap)
+        area_of_img = img.shape[0]*img.shape[1]
+        if len(tiles) == 1:
+            shapes = Detection.shape_detection(img, ratio_image_to_shape,
+                                               maximum_number_shapes)
+            return Detection.recognize_shapes(shapes, img)
+
+        workers = workers if workers > 0 else (os.cpu_count() or 1)
+        executor = Detection.get_executor(workers)
+        results = list(executor.map(
+            lambda tile: TiledDetection._detect_region(img, tile, area_of_img,
+                                                       ratio_image_to_shape),
+            tiles))
+        recognized_shapes = [shape for complete, _ in results for shape in complete]
+        cut_bboxes = [bbox for _, cut in results for bbox in cut]
+        cut_bboxes.extend(TiledDetection._get_cut_bboxes(img, tiles, tile_size,
+                                                         ratio_image_to_shape))
+        for completed in executor.map(
+                lambda bbox: TiledDetection._detect_cut_shape(
+                    img, bbox, area_of_img, ratio_image_to_shape),
+                cut_bboxes):
+            recognized_shapes.extend(completed)
+        recognized_shapes = TiledDetection.merge_shapes(recognized_shapes)
+        if maximum_number_shapes > 0:
+            recognized_shapes = recognized_shapes[:maximum_number_shapes]
+        return recognized_shapes
+
+
+    @staticmethod
+    def get_tiles(shape_img:Tuple, tile_size:int,
+                  overlap:int) -> List[Tuple[int, int, int, int]]:
+        """get overlapping tiles covering the image. Tiles are spread evenly,
+        so neighboring tiles overlap at least by overlap.
+
+        Args:
+            shape_img (Tuple): shape of image
+            tile_size (int): length of tile sides
+            overlap (int): minimum overlap of neighboring tiles
+
+        Returns:
+            List[Tuple[int, int, int, int]]: tiles (x, y, w, h)
+        """
+        height, width = shape_img[:2]
+        tile_size = max(tile_size, 2*overlap+1)
+        step = tile_size - overlap
+        starts_x = TiledDetection._get_tile_starts(width, tile_size, step)
+        starts_y = TiledDetection._get_tile_starts(height, tile_size, step)
+        return [(x, y, min(tile_size, width-x), min(tile_size, height-y))
+                for y in starts_y for x in starts_x]
+
+
+    @staticmethod
+    def _get_tile_starts(length:int, tile_size:int, step:int) -> List[int]:
+        """get start positions of tiles along one side. The first tile starts
+        at 0, the last ends at the end of the side.
+
+        Args:
+            length (int): length of side
+            tile_size (int): length of tile sides
+            step (int): maximum distance between tile starts
+
+        Returns:
+            List[int]: start positions
+        """
+        if length <= tile_size:
+            return [0]
+        number_tiles = -(-(length-tile_size) // step) + 1
+        return [int(start) for start in
+                np.linspace(0, length-tile_size, number_tiles).round()]
+
+
+    @staticmethod
+    def _get_cut_bboxes(img:cv2.typing.MatLike, tiles:List[Tuple[int, int, int, int]],
+                        tile_size:int, ratio_image_to_shape:float
+                        ) -> List[Tuple[int, int, int, int]]:
+        """get shapes, which are not complete in any tile, from the image 
+        scaled down to the tile size.
+
+        Args:
+            img (cv2.typing.MatLike): The image with shapes
+            tiles (List[Tuple[int, int, int, int]]): tiles (x, y, w, h)
+            tile_size (int): length of tile sides
+            ratio_image_to_shape (float): Ratio of image to shape
+
+        Returns:
+            List[Tuple[int, int, int, int]]: approximate bounding boxes
+                                             (x, y, w, h) in image coordinates
+        """
+        small_img = PictureModifications.resize_to_max_size(img, tile_size)
+        factor = img.shape[1] / small_img.shape[1]
+        shapes = Detection.shape_detection(small_img, ratio_image_to_shape, 0)
+
+        cut_bboxes = []
+        for shape in shapes:
+            x, y, w, h = cv2.boundingRect(shape)
+            bbox = (int(x*factor), int(y*factor), int(np.ceil(w*factor)), 
+                    int(np.ceil(h*factor)))
+            margin = TILE_BORDER_MARGIN + int(np.ceil(factor)) # scaling error
+            if not any(x_tile+margin <= bbox[0] and y_tile+margin <= bbox[1] and 
+                       bbox[0]+bbox[2] <= x_tile+w_tile-margin and 
+                       bbox[1]+bbox[3] <= y_tile+h_tile-margin
+                       for x_tile, y_tile, w_tile, h_tile in tiles):
+                cut_bboxes.append(bbox)
+        return cut_bboxes
+
+
+    @staticmethod
+    def _detect_region(img:cv2.typing.MatLike, region:Tuple[int, int, int, int],
+                       area_of_img:int, ratio_image_to_shape:float
+                       ) -> Tuple[List[DetectedShape], List[Tuple[int, int, int, int]]]:
+        """detects and recognizes shapes of one region, e.g. a tile. The 
+        minimum shape size is kept relative to the whole image.
+
+        Args:
+            img (cv2.typing.MatLike): The image with shapes
+            region (Tuple[int, int, int, int]): region (x, y, w, h)
+            area_of_img (int): area of whole image
+            ratio_image_to_shape (float): Ratio of image to shape
+
+        Returns:
+            Tuple[List[DetectedShape], List[Tuple[int, int, int, int]]]:
+                - [0] complete shapes of region in image coordinates
+                - [1] bounding boxes of shapes cut off at inner borders
+                      of region in image coordinates
+        """
+        x, y, w, h = region
+        img_region = img[y:y+h, x:x+w]
+        shapes = Detection.shape_detection(
+            img_region, ratio_image_to_shape*w*h/area_of_img, 0)
+
+        complete_shapes = []
+        cut_bboxes = []
+        for shape in shapes:
+            x_shape, y_shape, w_shape, h_shape = cv2.boundingRect(shape)
+            if TiledDetection._is_cut((x_shape, y_shape, w_shape, h_shape),
+                                      region, img.shape):
+                cut_bboxes.append((x+x_shape, y+y_shape, w_shape, h_shape))
+            else:
+                complete_shapes.append(shape)
+
+        recognized_shapes = Detection.recognize_shapes(complete_shapes, img_region)
+        for result in recognized_shapes:
+            result.translate(x, y)
+        return recognized_shapes, cut_bboxes
+
+
+    @staticmethod
+    def _detect_cut_shape(img:cv2.typing.MatLike, bbox:Tuple[int, int, int, int],
+                          area_of_img:int,
+                          ratio_image_to_shape:float) -> List[DetectedShape]:
+        """detects shape, which was cut off at a tile border, in a region 
+        around its bounding box. The region grows, until the shape is 
+        complete or the region is the whole image.
+
+        Args:
+            img (cv2.typing.MatLike): The image with shapes
+            bbox (Tuple[int, int, int, int]): bounding box (x, y, w, h) of
+                                              cut shape in image coordinates
+            area_of_img (int): area of whole image
+            ratio_image_to_shape (float): Ratio of image to shape
+
+        Returns:
+            List[DetectedShape]: completed shape in image coordinates. Empty, 
+                                 if not found again.
+        """
+        height, width = img.shape[:2]
+        while True:
+            x, y, w, h = bbox
+            padding = max(w, h)//2 + TILE_BORDER_MARGIN
+            x1, y1 = max(0, x-padding), max(0, y-padding)
+            x2, y2 = min(width, x+w+padding), min(height, y+h+padding)
+            region = (x1, y1, x2-x1, y2-y1)
+            img_region = img[y1:y2, x1:x2]
+            shapes = Detection.shape_detection(
+                img_region, ratio_image_to_shape*(x2-x1)*(y2-y1)/area_of_img, 0)
+
+            # shape covering cut shape most
+            best_shape, best_intersection = None, 0
+            for shape in shapes:
+                x_shape, y_shape, w_shape, h_shape = cv2.boundingRect(shape)
+                intersection = (
+                    max(0, min(x+w, x1+x_shape+w_shape) - max(x, x1+x_shape)) *
+                    max(0, min(y+h, y1+y_shape+h_shape) - max(y, y1+y_shape)))
+                if intersection > best_intersection:
+                    best_shape, best_intersection = shape, intersection
+                    bbox_best = (x1+x_shape, y1+y_shape, w_shape, h_shape)
+            if best_shape is None:
+                return []
+            if not TiledDetection._is_cut(cv2.boundingRect(best_shape), region,
+                                          img.shape):
+                break
+            bbox = bbox_best # grows, shape reaches border of region
+
+        recognized_shapes = Detection.recognize_shapes([best_shape], img_region)
+        for result in recognized_shapes:
+            result.translate(x1, y1)
+        return recognized_shapes
+
+
+    @staticmethod
+    def _is_cut(bbox:Tuple[int, int, int, int], region:Tuple[int, int, int, int],
+                shape_img:Tuple) -> bool:
+        """checks, if shape touches an inner border of region, where it may 
+        continue outside of region. Borders of the image are no inner borders.
+
+        Args:
+            bbox (Tuple[int, int, int, int]): bounding box of shape in region
+            region (Tuple[int, int, int, int]): region (x, y, w, h)
+            shape_img (Tuple): shape of image
+
+        Returns:
+            bool: True, if shape may be cut off. False, if complete.
+        """
+        x, y, w, h = region
+        border_left = TILE_BORDER_MARGIN if x > 0 else -1
+        border_top = TILE_BORDER_MARGIN if y > 0 else -1
+        border_right = w - TILE_BORDER_MARGIN if x+w < shape_img[1] else w+1
+        border_bottom = h - TILE_BORDER_MARGIN if y+h < shape_img[0] else h+1
+        x_shape, y_shape, w_shape, h_shape = bbox
+        return not (x_shape > border_left and y_shape > border_top and
+                    x_shape+w_shape < border_right and 
+                    y_shape+h_shape < border_bottom)
+
+
+    @staticmethod
+    def merge_shapes(shapes:List[DetectedShape]) -> List[DetectedShape]:
+        """merges shapes found in several tiles. Shapes with close centers
+        and overlapping bounding boxes are duplicates, the larger is kept.
+        Centers are hashed into cells, so only shapes of neighboring cells
+        are compared.
+
+        Args:
+            shapes (List[DetectedShape]): shapes of all tiles
+
+        Returns:
+            List[DetectedShape]: shapes without duplicates, largest first
+        """
+        shapes = sorted(shapes, key=lambda shape: shape.area, reverse=True)
+        cells: Dict[Tuple[int, int], List[DetectedShape]] = {}
+        merged_shapes = []
+        for shape in shapes:
+            cell_x = shape.center[0] // MERGE_CENTER_DISTANCE
+            cell_y = shape.center[1] // MERGE_CENTER_DISTANCE
+            neighbors = [kept for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                         for kept in cells.get((cell_x+dx, cell_y+dy), [])]
+            if any(TiledDetection._is_duplicate(shape, kept) for kept in neighbors):
+                continue
+            cells.setdefault((cell_x, cell_y), []).append(shape)
+            merged_shapes.append(shape)
+        return merged_shapes
+
+
+    @staticmethod
+    def _is_duplicate(shape_1:DetectedShape, shape_2:DetectedShape) -> bool:
+        """checks, if two shapes are the same shape found twice.
+
+        Args:
+            shape_1 (DetectedShape): first shape
+            shape_2 (DetectedShape): second shape
+
+        Returns:
+            bool: True, if duplicate. False, otherwise.
+        """
+        if np.hypot(shape_1.center[0]-shape_2.center[0],
+                    shape_1.center[1]-shape_2.center[1]) > MERGE_CENTER_DISTANCE:
+            return False
+        x1 = max(shape_1.bbox[0], shape_2.bbox[0])
+        y1 = max(shape_1.bbox[1], shape_2.bbox[1])
+        x2 = min(shape_1.bbox[0]+shape_1.bbox[2], shape_2.bbox[0]+shape_2.bbox[2])
+        y2 = min(shape_1.bbox[1]+shape_1.bbox[3], shape_2.bbox[1]+shape_2.bbox[3])
+        intersection = max(0, x2-x1) * max(0, y2-y1)
+        union = (shape_1.bbox[2]*shape_1.bbox[3] + shape_2.bbox[2]*shape_2.bbox[3]
+                 - intersection)
+        return union > 0 and intersection / union >= MERGE_MINIMUM_OVERLAP
+
+
+
+if __name__ == "__main__":
+    """Comparison of tiled and whole image detection on a tiled test image"""
+    import sys
+    import time
+    path_image = sys.argv[1] if len(sys.argv) > 1 else R"in/test_image_04.png"
+    img = np.tile(cv2.imread(path_image), (4, 4, 1))
+    for name, detect in (
+            ("whole image", lambda image: Detection.shape_recognition(
+                Detection.shape_detection(image, 1600), image)),
+            ("tiled", lambda image: TiledDetection.shape_detection_recognition(
+                image, 1024, 256, ratio_image_to_shape=1600))):
+        time_start = time.perf_counter()
+        recognized = detect(img)
+        print(f"{name}: {(time.perf_counter()-time_start)*1000:.1f} ms, "
+              f"{len(recognized)} shapes")
@@ -0,0 +1,343 @@
+"""Module for tracking detected shapes over consecutive camera frames."""
+
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+from detection_shape import Detection, DetectedShape, RATIO_IMAGE_TO_SHAPE
+from detection_change import ChangeDetector
+
+
+class Track:
+    """Shape, which was detected in one or more frames."""
+    def __init__(self, track_id:int, result:DetectedShape,
+                 frame_count:int) -> None:
+        """Initialize track
+
+        Args:
+            track_id (int): unique id of track
+            result (DetectedShape): recognized shape
+            frame_count (int): frame number of first detection
+        """
+        self.track_id = track_id
+        self.first_frame = frame_count
+        self.missed = 0
+        self.update(result)
+
+
+    def update(self, result:DetectedShape) -> None:
+        """updates track with new detection.
+
+        Args:
+            result (DetectedShape): recognized shape
+        """
+        result.track_id = self.track_id
+        self.result = result
+        self.missed = 0
+
+
+
+class ShapeTracker:
+    """Tracks shapes over frames and reuses detections of previous frames.
+
+    Full detection runs only every n-th frame. In between, only image regions,
+    which changed since they were detected last, are detected again.
+    New detections are associated with existing tracks by bounding box
+    overlap and center distance, so each shape keeps its track id.
+    """
+    def __init__(self, _redetect_interval:int=10, _change_threshold:int=25,
+                 _max_center_distance:int=20, _min_overlap:float=0.3,
+                 _max_missed:int=3, _diff_scale:float=0.25) -> None:
+        """Initialize shape tracker
+
+        Args:
+            _redetect_interval (int, optional): frames between two full
+                                detections. Defaults to 10.
+            _change_threshold (int, optional): minimum gray value difference
+                                of a changed pixel. Defaults to 25.
+            _max_center_distance (int, optional): maximum center distance in
+                                pixels of associated shapes. Defaults to 20.
+            _min_overlap (float, optional): minimum bounding box overlap
+                                (intersection over union) of associated
+                                shapes. Defaults to 0.3.
+            _max_missed (int, optional): number of detections, a track may be
+                                missed before it is removed. Defaults to 3.
+            _diff_scale (float, optional): scale of frames for change
+                                detection. Defaults to 0.25.
+        """
+        self.redetect_interval = max(1, _redetect_interval)
+        self.change_threshold = _change_threshold
+        self.max_center_distance = _max_center_distance
+        self.min_overlap = _min_overlap
+        self.max_missed = max(0, _max_missed)
+        self.diff_scale = _diff_scale
+
+        self.tracks: List[Track] = []
+        self._next_track_id = 1
+        self._reference_gray: Optional[np.ndarray] = None
+        self._last_full_frame = 0
+
+
+    def reset(self) -> None:
+        """removes all tracks and the reference frame."""
+        self.tracks = []
+        self._reference_gray = None
+        self._last_full_frame = 0
+
+
+    def process_frame(self, img:cv2.typing.MatLike,
+                      frame_count:int) -> Tuple[List[DetectedShape], List[DetectedShape]]:
+        """detects shapes in frame, where needed, and updates tracks.
+
+        Args:
+            img (cv2.typing.MatLike): frame of camera
+            frame_count (int): frame number
+
+        Returns:
+            Tuple[List[DetectedShape], List[DetectedShape]]:
+                - [0] all shapes in frame with track id
+                - [1] shapes, which appeared in this frame for the first time
+        """
+        gray_small = ChangeDetector.get_small_gray(img, self.diff_scale)
+        full_detection = (self._reference_gray is None or
+                          self._reference_gray.shape != gray_small.shape or
+                          frame_count - self._last_full_frame >= self.redetect_interval)
+
+        appeared = []
+        if full_detection:
+            appeared = self._detect_region(img, (0, 0, img.shape[1], img.shape[0]),
+                                           frame_count)
+            self._reference_gray = gray_small
+            self._last_full_frame = frame_count
+        else:
+            for region in self._get_changed_regions(gray_small, img.shape):
+                appeared.extend(self._detect_region(img, region, frame_count))
+                self._update_reference(gray_small, region)
+
+        return [track.result for track in self.tracks], appeared
+
+
+    def _detect_region(self, img:cv2.typing.MatLike,
+                       region:Tuple[int, int, int, int],
+                       frame_count:int) -> List[DetectedShape]:
+        """detects shapes within region and associates them with tracks.
+
+        Args:
+            img (cv2.typing.MatLike): frame of camera
+            region (Tuple[int, int, int, int]): region (x, y, w, h)
+            frame_count (int): frame number
+
+        Returns:
+            List[DetectedShape]: shapes, which appeared for the first time
+        """
+        x, y, w, h = region
+        img_region = img[y:y+h, x:x+w]
+        # minimum shape size is kept relative to the whole frame
+        shapes = Detection.shape_detection(
+            img_region, RATIO_IMAGE_TO_SHAPE*w*h/(img.shape[0]*img.shape[1]))
+        recognized = Detection.shape_recognition(shapes, img_region)
+
+        for result in recognized:
+            result.translate(x, y)
+
+        tracks_region = [track for track in self.tracks
+                         if self._get_overlap(track.result.bbox, region) > 0
+                         or self._is_inside(track.result.center, region)]
+        return self._associate(tracks_region, recognized, region, frame_count)
+
+
+    def _associate(self, tracks_region:List[Track],
+                   detections:List[DetectedShape],
+                   region:Tuple[int, int, int, int],
+                   frame_count:int) -> List[DetectedShape]:
+        """associates detections with tracks of same region.
+        Best matching pairs are associated first. Unmatched tracks count as
+        missed only, if they lie completely inside the region, as shapes 
+        cut by the region border are not detected.
+
+        Args:
+            tracks_region (List[Track]): tracks within detected region
+            detections (List[DetectedShape]): recognized shapes
+            region (Tuple[int, int, int, int]): detected region (x, y, w, h)
+            frame_count (int): frame number
+
+        Returns:
+            List[DetectedShape]: shapes of new tracks
+        """
+        candidates = []
+        for id_track, track in enumerate(tracks_region):
+            for id_detection, result in enumerate(detections):
+                overlap = self._get_overlap(track.result.bbox, result.bbox)
+                distance = np.hypot(track.result.center[0]-result.center[0],
+                                    track.result.center[1]-result.center[1])
+                if overlap >= self.min_overlap or distance <= self.max_center_distance:
+                    candidates.append((overlap, -distance, id_track, id_detection))
+        candidates.sort(reverse=True)
+
+        matched_tracks = set()
+        matched_detections = set()
+        for _, _, id_track, id_detection in candidates:
+            if id_track in matched_tracks or id_detection in matched_detections:
+                continue
+            matched_tracks.add(id_track)
+            matched_detections.add(id_detection)
+            tracks_region[id_track].update(detections[id_detection])
+
+        for id_track, track in enumerate(tracks_region):
+            if (id_track not in matched_tracks and 
+                self._is_bbox_inside(track.result.bbox, region)):
+                track.missed += 1
+        self.tracks = [track for track in self.tracks
+                       if track.missed <= self.max_missed]
+
+        appeared = []
+        for id_detection, result in enumerate(detections):
+            if id_detection in matched_detections:
+                continue
+            track = Track(self._next_track_id, result, frame_count)
+            self._next_track_id += 1
+            self.tracks.append(track)
+            appeared.append(track.result)
+        return appeared
+
+
+    def _get_changed_regions(self, gray_small:np.ndarray,
+                             shape_img:Tuple) -> List[Tuple[int, int, int, int]]:
+        """get regions of frame, which changed compared to reference frame.
+
+        Args:
+            gray_small (np.ndarray): small gray frame
+            shape_img (Tuple): shape of full frame
+
+        Returns:
+            List[Tuple[int, int, int, int]]: changed regions (x, y, w, h)
+                                             in full frame coordinates,
+                                             padded by the minimum shape size
+        """
+        diff = cv2.absdiff(gray_small, self._reference_gray)
+        _, mask = cv2.threshold(diff, self.change_threshold, 255, cv2.THRESH_BINARY)
+        if cv2.countNonZero(mask) == 0:
+            return []
+        mask = cv2.dilate(mask, np.ones((9, 9), dtype=np.uint8))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL,
+                                       cv2.CHAIN_APPROX_SIMPLE)
+
+        height, width = shape_img[:2]
+        size_minimum_shape = int(np.ceil(np.sqrt(height*width/RATIO_IMAGE_TO_SHAPE)))
+        margin = max(int(self.max_center_distance), size_minimum_shape)
+        regions = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            x1 = max(0, int(x/self.diff_scale) - margin)
+            y1 = max(0, int(y/self.diff_scale) - margin)
+            x2 = min(width, int((x+w)/self.diff_scale) + margin)
+            y2 = min(height, int((y+h)/self.diff_scale) + margin)
+            regions.append((x1, y1, x2-x1, y2-y1))
+        return regions
+
+
+    def _update_reference(self, gray_small:np.ndarray,
+                          region:Tuple[int, int, int, int]) -> None:
+        """copies detected region of small gray frame into reference frame.
+
+        Args:
+            gray_small (np.ndarray): small gray frame
+            region (Tuple[int, int, int, int]): region (x, y, w, h)
+                                                in full frame coordinates
+        """
+        x, y, w, h = (int(value*self.diff_scale) for value in region)
+        self._reference_gray[y:y+h+1, x:x+w+1] = gray_small[y:y+h+1, x:x+w+1]
+
+
+    @staticmethod
+    def _get_overlap(bbox_1:Tuple[int, int, int, int],
+                     bbox_2:Tuple[int, int, int, int]) -> float:
+        """get overlap (intersection over union) of two bounding boxes.
+
+        Args:
+            bbox_1 (Tuple[int, int, int, int]): first box (x, y, w, h)
+            bbox_2 (Tuple[int, int, int, int]): second box (x, y, w, h)
+
+        Returns:
+            float: overlap between 0 and 1
+        """
+        x1 = max(bbox_1[0], bbox_2[0])
+        y1 = max(bbox_1[1], bbox_2[1])
+        x2 = min(bbox_1[0]+bbox_1[2], bbox_2[0]+bbox_2[2])
+        y2 = min(bbox_1[1]+bbox_1[3], bbox_2[1]+bbox_2[3])
+        intersection = max(0, x2-x1) * max(0, y2-y1)
+        union = bbox_1[2]*bbox_1[3] + bbox_2[2]*bbox_2[3] - intersection
+        if union <= 0:
+            return 0.0
+        return intersection / union
+
+
+    @staticmethod
+    def _is_bbox_inside(bbox:Tuple[int, int, int, int],
+                        region:Tuple[int, int, int, int]) -> bool:
+        """checks, if bounding box lies completely inside region.
+
+        Args:
+            bbox (Tuple[int, int, int, int]): box (x, y, w, h)
+            region (Tuple[int, int, int, int]): region (x, y, w, h)
+
+        Returns:
+            bool: True, if inside. False, otherwise.
+        """
+        return (region[0] <= bbox[0] and region[1] <= bbox[1] and
+                bbox[0]+bbox[2] <= region[0]+region[2] and
+                bbox[1]+bbox[3] <= region[1]+region[3])
+
+
+    @staticmethod
+    def _is_inside(point:Tuple[int, int],
+                   region:Tuple[int, int, int, int]) -> bool:
+        """checks, if point is inside region.
+
+        Args:
+            point (Tuple[int, int]): point (x, y)
+            region (Tuple[int, int, int, int]): region (x, y, w, h)
+
+        Returns:
+            bool: True, if inside. False, otherwise.
+        """
+        return (region[0] <= point[0] < region[0]+region[2] and
+                region[1] <= point[1] < region[1]+region[3])
+
+
+
+if __name__ == "__main__":
+    """Testing of shape tracker with a moving shape near static shapes, 
+    then with camera"""
+    frame_static = np.full((480, 640, 3), 255, dtype=np.uint8)
+    cv2.rectangle(frame_static, (60, 60), (180, 180), (255, 0, 0), -1)
+    cv2.circle(frame_static, (480, 140), 60, (0, 0, 255), -1)
+    cv2.rectangle(frame_static, (300, 300), (400, 400), (0, 255, 0), -1)
+    tracker = ShapeTracker()
+    appeared_all = []
+    for frame_count in range(1, 41):
+        frame = frame_static.copy()
+        x = 100 + 10*frame_count
+        cv2.rectangle(frame, (x, 215), (x+70, 280), (0, 255, 255), -1)
+        appeared_all.extend(tracker.process_frame(frame, frame_count)[1])
+    print(f"Appearances of 4 shapes: {len(appeared_all)}")
+    assert len(appeared_all) == 4, "static shapes logged again"
+
+    import handling_cameras
+    cam_op = handling_cameras.CameraOperator()
+    cam_op.open_camera_stream()
+    from modificators_image import AnnotationRenderer
+    tracker = ShapeTracker()
+    frame_count = 0
+    while True:
+        frame = cam_op.get_image_camera()
+        if frame is None:
+            break
+        frame_count += 1
+        shapes, appeared = tracker.process_frame(frame, frame_count)
+        for shape in appeared:
+            print(f"New shape {shape.track_id}: {shape.pattern}, {shape.color}")
+        cv2.imshow("q: end tracking", AnnotationRenderer.render(frame, shapes))
+        if cv2.waitKey(1) == ord('q'):
+            break
+    cam_op.close_camera_stream()
@@ -1,15 +1,21 @@
 """GUI module for the Object Pattern Recognizer application."""
 
+from __future__ import annotations
 
+import threading
 import tkinter as tk
 from tkinter import filedialog, ttk
-from typing import Any, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
 
-import cv2
-from PIL import Image, ImageTk
-
-from controller import DetectionController
 from handling_configurations import ConfigReader, ConfigWriter
+from startup_report import StartupReport
+
+if TYPE_CHECKING: # imported on first use, see _load_modules
+    import cv2
+    from PIL import Image, ImageTk
+    from controller import DetectionController
+
+LAZY_MODULES = ("numpy", "cv2", "PIL.ImageTk", "controller") # heavy modules
 
 
 class ObjectPatternRecognizerGUI:
@@ -23,7 +29,8 @@ class ObjectPatternRecognizerGUI:
         master: The root tkinter window.
         mode: StringVar controlling camera/image mode selection.
         image_path: StringVar storing the selected image folder path.
-        controller: DetectionController instance managing the detection process.
+        controller: DetectionController instance managing the detection process,
+            created on first use.
         original_img_pil_list: List of processed images and their paths.
         current_image_index: Index of currently displayed image.
     """
@@ -65,21 +72,52 @@ class ObjectPatternRecognizerGUI:
         self._create_path_frame()
         self._create_control_frame()
         self._create_status_label()
+        self._create_statistics_frame()
         self._create_image_frame()
 
-        # Initialize controller
-        self.controller = DetectionController(
-            mode=self.mode,
-            image_path=self.image_path,
-            show_image_callback=self.collect_images,
-            update_status_callback=self.update_status
-        )
+        # Controller is created on first use, its modules are loaded
+        # in the background, as soon as the window is shown
+        self._controller: Optional[DetectionController] = None
 
         # Initialize widget states
         self.update_button_state()
+        self.update_statistics()
 
         # Bind window resize event
         self.master.bind('<Configure>', self.on_window_resize)
+        self.master.after_idle(self._on_window_shown)
+
+    @property
+    def controller(self) -> DetectionController:
+        """DetectionController managing the detection process, created on 
+        first use."""
+        if self._controller is None:
+            controller_module = StartupReport.import_module("controller")
+            self._controller = controller_module.DetectionController(
+                mode=self.mode,
+                image_path=self.image_path,
+                show_image_callback=self.collect_images,
+                update_status_callback=self.update_status
+            )
+        return self._controller
+
+    def _on_window_shown(self) -> None:
+        """Start loading heavy modules in the background."""
+        StartupReport.mark("window shown")
+        threading.Thread(target=self._load_modules, daemon=True).start()
+
+    @staticmethod
+    def _load_modules() -> None:
+        """Import heavy modules, so the first detection starts without 
+        delay. Imports on first use wait for this thread."""
+        for name in LAZY_MODULES:
+            try:
+                StartupReport.import_module(name)
+            except ImportError as e:
+                print(f"ERROR: Module {name} could not be loaded: \n{e}")
+                return
+        StartupReport.mark("modules loaded")
+        StartupReport.print_report()
 
     def _create_mode_frame(self) -> None:
         """Create the mode selection frame."""
@@ -144,6 +182,18 @@ class ObjectPatternRecognizerGUI:
             sticky="ew"
         )
 
+    def _create_statistics_frame(self) -> None:
+        """Create the frame for live statistics, if enabled in config."""
+        self.statistics_frame = ttk.LabelFrame(self.master, text="Statistics")
+        self.statistics_label = ttk.Label(
+            self.statistics_frame,
+            text="",
+            justify=tk.LEFT
+        )
+        self.statistics_label.pack(side=tk.LEFT, padx=5, pady=5)
+        if self.config_reader.get_value('statistics', False):
+            self.statistics_frame.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
+
     def _create_image_frame(self) -> None:
         """Create the frame for displaying images."""
         # Main container for image and navigation
@@ -271,15 +321,16 @@ class ObjectPatternRecognizerGUI:
         if self.mode.get() == "IMAGE":
             self.image_names = self.controller.get_image_names()
 
-        # Update button states
+        # Update button states, watched folders run until stopped
         self.toggle_button.config(text="Stop Detection")
-        if self.mode.get() == "IMAGE":
+        if (self.mode.get() == "IMAGE" and 
+            not self.config_reader.get_value('folder_watch', False)):
             self.toggle_button.state(['disabled'])
 
     def stop_detection(self) -> None:
         """Stop the detection process."""
-        if self.controller and self.controller.running:
-            self.controller.stop_detection()
+        if self._controller and self._controller.running:
+            self._controller.stop_detection()
             self.toggle_button.config(text="Start Detection")
             self.toggle_button.state(['!disabled'])
 
@@ -299,6 +350,8 @@ class ObjectPatternRecognizerGUI:
             img (cv2.typing.MatLike): The image to be processed.
             image_path (str, optional): Path of the image file. Defaults to "".
         """
+        import cv2
+        from PIL import Image
         try:
             img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
             pil_image = Image.fromarray(img_rgb)
@@ -381,6 +434,7 @@ class ObjectPatternRecognizerGUI:
         new_size = (int(img_width * ratio), int(img_height * ratio))
     
         # Update canvas with resized image
+        from PIL import Image, ImageTk
         resized_img = image_to_show.resize(new_size, Image.Resampling.LANCZOS)
         self.img_tk = ImageTk.PhotoImage(resized_img)
         self.canvas.delete("all")
@@ -403,6 +457,19 @@ class ObjectPatternRecognizerGUI:
         """
         self.update_displayed_image()
 
+    def update_statistics(self, interval_ms: int = 1000) -> None:
+        """Show live statistics of the controller and schedule next update.
+
+        Args:
+            interval_ms (int, optional): Time between updates in ms.
+                Defaults to 1000.
+        """
+        if self._controller is not None:
+            text = self._controller.get_statistics_text()
+            if text:
+                self.statistics_label.config(text=text)
+        self.master.after(interval_ms, self.update_statistics, interval_ms)
+
     def update_status(self, message: str) -> None:
         """Update the status label text.
 
@@ -0,0 +1,258 @@
+"""Module for exporting annotated images and videos to the output folder."""
+
+import os
+import threading
+from typing import Dict, List, Optional
+
+import cv2
+
+from modificators_image import PictureModifications
+from pipeline import PipelineStage, POLICY_BLOCK, POLICY_DROP
+
+EXPORT_FORMATS = [".jpg", ".png"]
+VIDEO_EXTENSIONS = {"mp4v": ".mp4", "avc1": ".mp4", "XVID": ".avi", "MJPG": ".avi"}
+
+
+class ImageExporter:
+    """Writes annotated images to a folder.
+
+    Images are encoded and written by a pool of worker threads, which take
+    them from a bounded queue. If the queue is full, images are either
+    dropped or the caller waits, depending on the policy.
+    """
+    def __init__(self, _path_folder:str, _format:str=".jpg",
+                 _jpeg_quality:int=90, _png_compression:int=3,
+                 _max_size:int=0, _workers:int=2, _queue_size:int=8,
+                 _policy:str=POLICY_BLOCK) -> None:
+        """Initialize image exporter
+
+        Args:
+            _path_folder (str): folder of exported images
+            _format (str, optional): ".jpg" or ".png". Defaults to ".jpg".
+            _jpeg_quality (int, optional): JPEG quality (0 to 100).
+                                           Defaults to 90.
+            _png_compression (int, optional): PNG compression level (0 to 9).
+                                              Defaults to 3.
+            _max_size (int, optional): maximum length of longer image side.
+                                       Defaults to 0, no limit.
+            _workers (int, optional): number of encoder threads. Defaults to 2.
+            _queue_size (int, optional): number of queued images.
+                                         Defaults to 8.
+            _policy (str, optional): "block" or "drop", if queue is full.
+                                     Defaults to "block".
+        """
+        self.path_folder = _path_folder
+        self.format = _format.lower() if _format.startswith(".") else f".{_format.lower()}"
+        if self.format == ".jpeg":
+            self.format = ".jpg"
+        if self.format not in EXPORT_FORMATS:
+            print(f"ERROR: Unknown export format {_format}, using .jpg")
+            self.format = ".jpg"
+        self.max_size = _max_size
+        self.encode_parameters: List[int] = [cv2.IMWRITE_JPEG_QUALITY,
+                                             min(max(_jpeg_quality, 0), 100)]
+        if self.format == ".png":
+            self.encode_parameters = [cv2.IMWRITE_PNG_COMPRESSION,
+                                      min(max(_png_compression, 0), 9)]
+        self.written = 0
+        self._lock = threading.Lock()
+        self._stage = PipelineStage("export", self._write_image, _workers,
+                                    _queue_size, _policy,
+                                    process_when_stopping=True)
+
+
+    def start(self) -> None:
+        """starts encoder threads."""
+        self._stage.start()
+
+
+    def export(self, img:cv2.typing.MatLike, image_name:str) -> bool:
+        """passes image to encoder threads. The image must not be modified
+        afterwards.
+
+        Args:
+            img (cv2.typing.MatLike): annotated image
+            image_name (str): name of image, may contain subfolders
+
+        Returns:
+            bool: True, if queued. False, if dropped.
+        """
+        return self._stage.put((img, image_name))
+
+
+    def finish(self, timeout:Optional[float]=None) -> None:
+        """writes all queued images and stops encoder threads.
+
+        Args:
+            timeout (Optional[float], optional): maximum time to wait per
+                                        thread in seconds. Defaults to None.
+        """
+        self._stage.finish()
+        self._stage.join(timeout)
+
+
+    def get_statistics(self) -> Dict[str, int]:
+        """get number of written and dropped images.
+
+        Returns:
+            Dict[str, int]: statistics of export
+        """
+        return {'written': self.written, 'dropped': self._stage.dropped}
+
+
+    def _write_image(self, task:tuple) -> None:
+        """encodes and writes one image.
+
+        Args:
+            task (tuple): annotated image and name of image
+        """
+        img, image_name = task
+        img = PictureModifications.resize_to_max_size(img, self.max_size)
+        success, buffer = cv2.imencode(self.format, img, self.encode_parameters)
+        if not success:
+            print(f"ERROR: Cannot encode image: {image_name}")
+            return None
+
+        path_image = os.path.join(self.path_folder,
+                                  os.path.splitext(image_name)[0] + self.format)
+        try:
+            os.makedirs(os.path.dirname(path_image), exist_ok=True)
+            buffer.tofile(path_image)
+        except OSError as e:
+            print(f"ERROR: Cannot write image: \n{e}")
+            return None
+        with self._lock:
+            self.written += 1
+        return None
+
+
+
+class VideoRecorder:
+    """Writes annotated frames to a video file.
+
+    Frames are written by a dedicated thread, which takes them from a
+    bounded queue. If the queue is full, because the encoder falls behind,
+    frames are dropped, so the caller never waits.
+    """
+    def __init__(self, _path_video:str, _codec:str="mp4v", _fps:float=15,
+                 _scale:float=1.0, _queue_size:int=16) -> None:
+        """Initialize video recorder
+
+        Args:
+            _path_video (str): path of video file without extension, which
+                               is chosen by codec
+            _codec (str, optional): FourCC of codec. Defaults to "mp4v".
+            _fps (float, optional): frame rate of video. Defaults to 15.
+            _scale (float, optional): scale of frames. Defaults to 1.0.
+            _queue_size (int, optional): number of queued frames.
+                                         Defaults to 16.
+        """
+        self.codec = _codec if len(_codec) == 4 else "mp4v"
+        self.path_video = _path_video + VIDEO_EXTENSIONS.get(self.codec, ".avi")
+        self.fps = _fps if _fps > 0 else 15
+        self.scale = _scale if _scale > 0 else 1.0
+        self.written = 0
+        self.failed = False # video file could not be opened, nothing is recorded
+        self._writer: Optional[cv2.VideoWriter] = None
+        self._size: Optional[tuple] = None
+        self._last_frame = 0
+        self._stage = PipelineStage("record", self._write_frame, 1, _queue_size,
+                                    POLICY_DROP, process_when_stopping=True)
+
+
+    def start(self) -> None:
+        """starts recording thread."""
+        self._stage.start()
+
+
+    def record(self, img:cv2.typing.MatLike, frame_count:int) -> bool:
+        """passes frame to recording thread. The frame must not be modified
+        afterwards.
+
+        Args:
+            img (cv2.typing.MatLike): annotated frame
+            frame_count (int): frame number. Frames older than the last
+                               written frame are skipped.
+
+        Returns:
+            bool: True, if queued. False, if dropped or recording failed.
+        """
+        if self.failed:
+            return False
+        return self._stage.put((img, frame_count))
+
+
+    def finish(self, timeout:Optional[float]=None) -> None:
+        """writes all queued frames and closes video file.
+
+        Args:
+            timeout (Optional[float], optional): maximum time to wait in
+                                                 seconds. Defaults to None.
+        """
+        self._stage.finish()
+        self._stage.join(timeout)
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+
+    def get_statistics(self) -> Dict[str, int]:
+        """get number of written and dropped frames.
+
+        Returns:
+            Dict[str, int]: statistics of recording
+        """
+        return {'written': self.written, 'dropped': self._stage.dropped}
+
+
+    def _write_frame(self, task:tuple) -> None:
+        """writes one frame. Video file is opened with size of first frame,
+        later frames are resized to it. If it cannot be opened, recording is
+        disabled for this run.
+
+        Args:
+            task (tuple): annotated frame and frame number
+        """
+        img, frame_count = task
+        if self.failed or frame_count <= self._last_frame:
+            return None
+        self._last_frame = frame_count
+
+        if self._writer is None:
+            height, width = img.shape[:2]
+            self._size = (max(2, int(width*self.scale)), max(2, int(height*self.scale)))
+            os.makedirs(os.path.dirname(self.path_video), exist_ok=True)
+            self._writer = cv2.VideoWriter(self.path_video,
+                                           cv2.VideoWriter_fourcc(*self.codec),
+                                           self.fps, self._size)
+            if not self._writer.isOpened():
+                print(f"ERROR: Cannot open video file: {self.path_video}")
+                self._writer.release()
+                self._writer = None
+                self.failed = True
+                return None
+        if (img.shape[1], img.shape[0]) != self._size:
+            img = cv2.resize(img, self._size, interpolation=cv2.INTER_AREA)
+        self._writer.write(img)
+        self.written += 1
+        return None
+
+
+
+if __name__ == "__main__":
+    """Testing of image exporter"""
+    import numpy as np
+    exporter = ImageExporter(os.path.join("out", "annotated", "test"), ".png")
+    exporter.start()
+    for number in range(5):
+        exporter.export(np.full((100, 100, 3), number*50, dtype=np.uint8),
+                        f"image_{number}")
+    exporter.finish()
+    print(exporter.get_statistics())
+
+    recorder = VideoRecorder(os.path.join("out", "recordings", "test"), _scale=0.5)
+    recorder.start()
+    for number in range(30):
+        recorder.record(np.full((240, 320, 3), number*8, dtype=np.uint8), number+1)
+    recorder.finish()
+    print(recorder.get_statistics())
@@ -0,0 +1,230 @@
+"""Module for watching a folder for new images and remembering processed files."""
+
+import os
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from handling_paths_files import IntegrityChecker
+
+try: # inotify is optional, polling is used otherwise
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+
+class FolderWatcher:
+    """Watches a folder for new image files and reports them,
+    once they are completely written.
+    Uses inotify, if available. Polls the folder with scandir, otherwise.
+    """
+    def __init__(self, _path_folder:str, _poll_interval:float=0.5,
+                 _stop_event:Optional[threading.Event]=None) -> None:
+        """Initialize folder watcher
+
+        Args:
+            _path_folder (str): Path of watched folder
+            _poll_interval (float, optional): Time between two checks of
+                                              folder in seconds. Defaults to 0.5.
+            _stop_event (Optional[threading.Event], optional): Event to interrupt
+                                              waiting. Defaults to None.
+        """
+        self.path_folder = _path_folder
+        self.poll_interval = max(0.05, _poll_interval)
+        self.stop_event = _stop_event or threading.Event()
+
+        self._inotify = None
+        self._pending: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._reported: set = set()
+
+
+    def start(self) -> bool:
+        """starts watching and registers already existing files.
+
+        Returns:
+            bool: True, if successful. False, otherwise.
+        """
+        if not IntegrityChecker.check_path_validity(self.path_folder):
+            return False
+        if INotify is not None:
+            try:
+                self._inotify = INotify()
+                self._inotify.add_watch(self.path_folder,
+                                        inotify_flags.CLOSE_WRITE |
+                                        inotify_flags.MOVED_TO)
+            except OSError as e:
+                print(f"inotify not available, polling folder instead: {e}")
+                self._inotify = None
+        self._scan_folder()
+        return True
+
+
+    def stop(self) -> None:
+        """stops watching."""
+        self.stop_event.set()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+    def get_complete_files(self) -> List[str]:
+        """waits up to one poll interval for new files.
+
+        Returns:
+            List[str]: paths of new and completely written files. Empty, otherwise.
+        """
+        complete_files = []
+        if self._inotify is not None:
+            timeout_ms = int(self.poll_interval*1000)
+            for event in self._inotify.read(timeout=timeout_ms):
+                path_file = os.path.join(self.path_folder, event.name)
+                if IntegrityChecker.check_file_type(event.name):
+                    # closed after writing or moved in: file is complete
+                    self._pending.pop(path_file, None)
+                    self._report(path_file, complete_files)
+        else:
+            self.stop_event.wait(self.poll_interval)
+            self._scan_folder()
+
+        complete_files.extend(self._check_pending_files())
+        return complete_files
+
+
+    def _scan_folder(self) -> None:
+        """registers files in folder, which have not been reported yet."""
+        try:
+            with os.scandir(self.path_folder) as entries:
+                for entry in entries:
+                    if not IntegrityChecker.check_file_type(entry.name):
+                        continue
+                    if (entry.path in self._reported or
+                        entry.path in self._pending):
+                        continue
+                    if entry.is_file():
+                        self._pending[entry.path] = None
+        except OSError as e:
+            print(f"ERROR: Cannot scan folder: \n{e}")
+
+
+    def _check_pending_files(self) -> List[str]:
+        """checks pending files, if size and modification time stayed the same
+        since last check, i.e. writing is finished.
+
+        Returns:
+            List[str]: paths of completely written files
+        """
+        complete_files = []
+        for path_file, stat_last in list(self._pending.items()):
+            try:
+                stat_file = os.stat(path_file)
+            except OSError: # removed before finished
+                del self._pending[path_file]
+                continue
+            stat_new = (stat_file.st_size, stat_file.st_mtime_ns)
+            if stat_file.st_size > 0 and stat_new == stat_last:
+                del self._pending[path_file]
+                self._report(path_file, complete_files)
+            else:
+                self._pending[path_file] = stat_new
+        return complete_files
+
+
+    def _report(self, path_file:str, complete_files:List[str]) -> None:
+        """adds file to complete files, if not reported yet.
+
+        Args:
+            path_file (str): path of file
+            complete_files (List[str]): list of complete files
+        """
+        if path_file in self._reported:
+            return
+        self._reported.add(path_file)
+        complete_files.append(path_file)
+
+
+
+class ProcessedIndex:
+    """Persistent index of processed files, so restarts don't process them again.
+    Entries are appended as json lines, later entries replace earlier ones.
+    """
+    def __init__(self, _path_index:str) -> None:
+        """Initialize processed index
+
+        Args:
+            _path_index (str): path of index file
+        """
+        self.path_index = _path_index
+        self._entries: Dict[str, Tuple[int, int]] = {}
+        self._load()
+
+
+    def is_processed(self, path_file:str) -> bool:
+        """checks, if file was processed already and did not change since.
+
+        Args:
+            path_file (str): path of file
+
+        Returns:
+            bool: True, if processed. False, otherwise.
+        """
+        entry = self._entries.get(os.path.abspath(path_file))
+        if entry is None:
+            return False
+        try:
+            stat_file = os.stat(path_file)
+        except OSError:
+            return False
+        return entry == (stat_file.st_size, stat_file.st_mtime_ns)
+
+
+    def mark_processed(self, path_file:str) -> None:
+        """adds file to index and saves it.
+
+        Args:
+            path_file (str): path of file
+        """
+        path_abs = os.path.abspath(path_file)
+        try:
+            stat_file = os.stat(path_abs)
+        except OSError:
+            return
+        entry = (stat_file.st_size, stat_file.st_mtime_ns)
+        self._entries[path_abs] = entry
+
+        try:
+            directory = os.path.dirname(self.path_index)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path_index, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"path": path_abs,
+                                       "size": entry[0],
+                                       "mtime_ns": entry[1]}) + "\n")
+        except OSError as e:
+            print(f"ERROR: Cannot write processed index: \n{e}")
+
+
+    def _load(self) -> None:
+        """loads index from file, if it exists."""
+        if not os.path.isfile(self.path_index):
+            return
+        with open(self.path_index, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    data = json.loads(line)
+                    self._entries[data["path"]] = (data["size"], data["mtime_ns"])
+                except (ValueError, KeyError):
+                    continue # skip partly written line
+
+
+
+if __name__ == "__main__":
+    """Testing of folder watcher: prints new images in folder "in"."""
+    watcher = FolderWatcher("in")
+    watcher.start()
+    print(f"Watching folder (inotify: {watcher._inotify is not None}) ...")
+    try:
+        while True:
+            for path_file in watcher.get_complete_files():
+                print(f"New file: {path_file}")
+    except KeyboardInterrupt:
+        watcher.stop()
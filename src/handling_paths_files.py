@@ -1,11 +1,18 @@
 import os
+import mmap
+import json
+import hashlib
 import numpy as np
 import cv2
 from PIL import Image as PilImg
 from PIL.Image import Image
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 VALID_TYPES = [".jpg", ".png"]
+IMREAD_FLAGS = {1: cv2.IMREAD_COLOR,
+                2: cv2.IMREAD_REDUCED_COLOR_2,
+                4: cv2.IMREAD_REDUCED_COLOR_4,
+                8: cv2.IMREAD_REDUCED_COLOR_8}
 
 class PathHandling():
     """Functions for path handling."""
@@ -77,8 +84,24 @@ class PathHandling():
     
 class FileHandling():
     """Functions for handling files"""
-    def __init__(self, _path_input:str=""):
+    def __init__(self, _path_input:str="", _detection_resolution:int=0, 
+                 _recursive:bool=False, _file_index:Optional["FileIndex"]=None):
+        """Initialize file handling
+
+        Args:
+            _path_input (str, optional): Path for input folder. Defaults to "".
+            _detection_resolution (int, optional): Minimum length of the shorter 
+                        image side required for detection. JPEGs bigger than 
+                        this are decoded at reduced size. Defaults to 0, 
+                        decodes always at full size.
+            _recursive (bool, optional): Search subfolders too. Defaults to False.
+            _file_index (Optional[FileIndex], optional): Persistent index to 
+                        list folders without scanning them. Defaults to None.
+        """
         self.path_input = _path_input
+        self.detection_resolution = max(0, _detection_resolution)
+        self.recursive = _recursive
+        self.file_index = _file_index
         self._file_current = ""
     
     
@@ -106,29 +129,61 @@ class FileHandling():
         Returns:
             Tuple[List]: Tuple with lists aof images and paths
                     - Tuple[0] cv2.typing.MatLike:  images
-                    - Tuple[1] str:                 paths of images
+                    - Tuple[1] str:                 paths of images, 
+                                                    relative to input folder
         """
-        subfolderCheck: bool=False
-        
-        path = self.path_input
         items = []
         filenames = [] 
-        for root, dirs, files in os.walk(path):
-                for file in files: 
-                    file = str(file)
-                    if not(search_term) or search_term in file: 
-                        if IntegrityChecker.check_file_type(file):
-                            filepath = os.path.join(path, file)
-                            item = self.open_one_file(filepath)
-                            items.append(item)
-                            filenames.append(file)
-                if (subfolderCheck is False): 
-                    break
+        for filepath in self.list_searched_files(search_term):
+            item = self.open_one_file(filepath)
+            items.append(item)
+            filenames.append(os.path.relpath(filepath, self.path_input))
         if not items: 
             print("ERROR: No files found")
         return (items, filenames)
     
     
+    def list_all_files(self) -> Tuple[List[str], List[str]]:
+        """lists all files in folder without opening them
+
+        Returns:
+            Tuple[List[str], List[str]]: Tuple with lists of paths and names
+                    - Tuple[0] str:     paths of images
+                    - Tuple[1] str:     names of images, 
+                                        relative to input folder
+        """
+        filepaths = self.list_searched_files()
+        filenames = [os.path.relpath(filepath, self.path_input) 
+                     for filepath in filepaths]
+        if not filepaths: 
+            print("ERROR: No files found")
+        return (filepaths, filenames)
+    
+    
+    def list_searched_files(self, search_term:str="") -> List[str]:
+        """lists paths of supported files which contain search term in 
+        file name. Subfolders are searched, if recursive.
+
+        Args:
+            search_term (str, optional): search term for specific files or 
+                                         file types. 
+                                         Defaults to "", lists all files.
+
+        Returns:
+            List[str]: paths of files. Empty, otherwise.
+        """
+        file_index = self.file_index
+        if file_index is None:
+            file_index = FileIndex()
+        
+        filepaths = file_index.list_files(self.path_input, self.recursive)
+        file_index.save()
+        if search_term:
+            filepaths = [filepath for filepath in filepaths 
+                         if search_term in os.path.basename(filepath)]
+        return filepaths
+    
+    
     def open_one_file(self, path_file:str)->cv2.typing.MatLike:
         """open one file at selected path.
 
@@ -139,7 +194,10 @@ class FileHandling():
             cv2.typing.MatLike: image in openCV format
         """
         try:
-            ImageCv = ImageConverter().open_image_opencv(path_file)
+            converter = ImageConverter()
+            reduce_factor = converter.get_reduce_factor(path_file, 
+                                                        self.detection_resolution)
+            ImageCv = converter.open_image_opencv(path_file, reduce_factor)
         except Exception as e:
              print(f"ERROR: Cannot open image: \n{e}")
              return None
@@ -147,19 +205,293 @@ class FileHandling():
       
     
 
+class FileIndex:
+    """Persistent index of supported files in a folder tree.
+    Folder listings are reused as long as the modification time of the folder 
+    did not change. Size, modification time and content hash of files are 
+    stored, the hash is computed only when needed.
+    """
+    _version = 1
+    
+    def __init__(self, _path_index:str="") -> None:
+        """Initialize file index
+
+        Args:
+            _path_index (str, optional): path of index file. 
+                                         Defaults to "", index is not saved.
+        """
+        self.path_index = _path_index
+        self._folders: Dict[str, Dict] = {}
+        self._files: Dict[str, List] = {}
+        self._changed = False
+        self._load()
+    
+    
+    def list_files(self, path_root:str, recursive:bool=False) -> List[str]:
+        """lists paths of supported files in folder.
+
+        Args:
+            path_root (str): path of folder
+            recursive (bool, optional): list subfolders too. Defaults to False.
+
+        Returns:
+            List[str]: sorted paths of files. Empty, otherwise.
+        """
+        filepaths = []
+        folders = [path_root]
+        while folders:
+            path_folder = folders.pop()
+            names_files, names_folders = self._list_folder(path_folder)
+            filepaths.extend(os.path.join(path_folder, name) 
+                             for name in names_files)
+            if recursive:
+                folders.extend(os.path.join(path_folder, name) 
+                               for name in reversed(names_folders))
+        return filepaths
+    
+    
+    def get_content_hash(self, path_file:str) -> str:
+        """get content hash of file. Hash is only computed again, 
+        if size or modification time of file changed.
+
+        Args:
+            path_file (str): path of file
+
+        Returns:
+            str: content hash of file. Empty, if file cannot be read.
+        """
+        try:
+            stat_file = os.stat(path_file)
+            entry = self._files.get(path_file)
+            if (entry and entry[2] and entry[0] == stat_file.st_size 
+                and entry[1] == stat_file.st_mtime_ns):
+                return entry[2]
+            content_hash = self._hash_file(path_file)
+        except OSError as e:
+            print(f"ERROR: Cannot read file: \n{e}")
+            return ""
+        
+        self._files[path_file] = [stat_file.st_size, stat_file.st_mtime_ns, 
+                                  content_hash]
+        self._changed = True
+        return content_hash
+    
+    
+    def save(self) -> bool:
+        """saves index, if it changed.
+
+        Returns:
+            bool: True, if successful. False, otherwise.
+        """
+        if not (self.path_index and self._changed):
+            return True
+        data = {"version": self._version, 
+                "folders": self._folders, 
+                "files": self._files}
+        path_temp = self.path_index + ".tmp"
+        try:
+            directory = os.path.dirname(self.path_index)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path_temp, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(path_temp, self.path_index)
+        except OSError as e:
+            print(f"ERROR: Cannot save file index: \n{e}")
+            return False
+        self._changed = False
+        return True
+    
+    
+    def _list_folder(self, path_folder:str) -> Tuple[List[str], List[str]]:
+        """lists supported files and subfolders of one folder. 
+        Stored listing is used, if folder did not change.
+
+        Args:
+            path_folder (str): path of folder
+
+        Returns:
+            Tuple[List[str], List[str]]: names of files and subfolders
+        """
+        try:
+            mtime_folder = os.stat(path_folder).st_mtime_ns
+        except OSError:
+            return [], []
+        entry = self._folders.get(path_folder)
+        if entry and entry["mtime_ns"] == mtime_folder:
+            return entry["files"], entry["folders"]
+        
+        names_files = []
+        names_folders = []
+        try:
+            with os.scandir(path_folder) as entries:
+                for dir_entry in entries:
+                    if dir_entry.is_dir(follow_symlinks=False):
+                        names_folders.append(dir_entry.name)
+                    elif (IntegrityChecker.check_file_type(dir_entry.name) 
+                          and dir_entry.is_file()):
+                        names_files.append(dir_entry.name)
+                        self._update_file(dir_entry)
+        except OSError as e:
+            print(f"ERROR: Cannot list folder: \n{e}")
+            return [], []
+        
+        names_files.sort()
+        names_folders.sort()
+        self._folders[path_folder] = {"mtime_ns": mtime_folder, 
+                                      "files": names_files,
+                                      "folders": names_folders}
+        self._changed = True
+        return names_files, names_folders
+    
+    
+    def _update_file(self, dir_entry:os.DirEntry) -> None:
+        """updates size and modification time of file. 
+        Hash is reset, if file changed.
+
+        Args:
+            dir_entry (os.DirEntry): entry of file
+        """
+        stat_file = dir_entry.stat()
+        entry = self._files.get(dir_entry.path)
+        if (entry and entry[0] == stat_file.st_size 
+            and entry[1] == stat_file.st_mtime_ns):
+            return
+        self._files[dir_entry.path] = [stat_file.st_size, 
+                                       stat_file.st_mtime_ns, ""]
+    
+    
+    def _load(self) -> None:
+        """loads index from file, if it exists."""
+        if not (self.path_index and os.path.isfile(self.path_index)):
+            return
+        try:
+            with open(self.path_index, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: Cannot load file index, creating new one: \n{e}")
+            return
+        if data.get("version") != self._version:
+            return
+        self._folders = data.get("folders", {})
+        self._files = data.get("files", {})
+    
+    
+    @staticmethod
+    def _hash_file(path_file:str) -> str:
+        """computes content hash of file.
+
+        Args:
+            path_file (str): path of file
+
+        Returns:
+            str: hex digest of file content
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(path_file, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+    
+    
+    @staticmethod
+    def get_index_path(path_folder_index:str, path_root:str) -> str:
+        """get path of index file for a root folder. 
+
+        Args:
+            path_folder_index (str): folder, where index files are stored
+            path_root (str): root folder, which is indexed
+
+        Returns:
+            str: path of index file
+        """
+        name_hash = hashlib.blake2b(os.path.abspath(path_root).encode("utf-8"), 
+                                    digest_size=8).hexdigest()
+        return os.path.join(path_folder_index, f"file_index_{name_hash}.json")
+
+
+
 class ImageConverter:
-    """use pillow to open an image (more types are supported) and converts it to openCV image. 
+    """decodes images into openCV format. 
+    OpenCV decodes directly from the memory-mapped file, pillow is only used as 
+    fallback for image types openCV cannot read.
     """
-    def open_image_opencv(self, path_image: str)->cv2.typing.MatShape:
-        """opens an image in openCV format with pillow
+    def open_image_opencv(self, path_image: str, 
+                          reduce_factor: int=1)->cv2.typing.MatLike:
+        """opens an image in openCV format (BGR, 3 channels)
+
+        Args:
+            path_image (str): path to image
+            reduce_factor (int, optional): decode image reduced by factor 
+                                           1, 2, 4 or 8. Defaults to 1.
+
+        Returns:
+            cv2.typing.MatLike: image in openCV format
+        """
+        image_cv = self.decode_image_opencv(path_image, reduce_factor)
+        if image_cv is None:
+            pil_image = self.open_image_pillow(path_image)
+            if reduce_factor > 1:
+                pil_image = pil_image.reduce(reduce_factor)
+            image_cv = self.convert_image_pillow_to_opencv(pil_image)
+        return image_cv
+    
+    
+    def get_reduce_factor(self, path_image: str, 
+                          detection_resolution: int=0) -> int:
+        """get biggest JPEG decode reduce factor (1, 2, 4 or 8), for which the 
+        shorter image side still reaches the detection resolution. 
+        Only the image header is read. 
+
+        Args:
+            path_image (str): path to image
+            detection_resolution (int, optional): Minimum length of the shorter 
+                                                  image side. Defaults to 0, 
+                                                  no reduction.
+
+        Returns:
+            int: reduce factor. 1 (full decode), if image is too small or no JPEG.
+        """
+        if detection_resolution <= 0:
+            return 1
+        try:
+            with PilImg.open(path_image) as pil_image:
+                if pil_image.format != "JPEG":
+                    return 1
+                shorter_side = min(pil_image.size)
+        except Exception:
+            return 1
+        
+        for reduce_factor in sorted(IMREAD_FLAGS, reverse=True):
+            if shorter_side // reduce_factor >= detection_resolution:
+                return reduce_factor
+        return 1
+    
+    
+    def decode_image_opencv(self, path_image: str, 
+                            reduce_factor: int=1)->Optional[cv2.typing.MatLike]:
+        """decodes an image with openCV from a memory-mapped file. 
+        JPEGs are decoded at reduced resolution directly (DCT scaling), 
+        if reduce factor is bigger than 1.
 
         Args:
             path_image (str): path to image
+            reduce_factor (int, optional): decode image reduced by factor 
+                                           1, 2, 4 or 8. Defaults to 1.
 
         Returns:
-            cv2.typing.MatShape: image in openCV format
+            Optional[cv2.typing.MatLike]: image in openCV format. 
+                                          None, if openCV cannot decode it.
         """
-        return self.convert_image_pillow_to_opencv(self.open_image_pillow(path_image))
+        read_flag = IMREAD_FLAGS.get(reduce_factor, cv2.IMREAD_COLOR)
+        with open(path_image, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                buffer = np.frombuffer(mapped, dtype=np.uint8)
+                image_cv = cv2.imdecode(buffer, read_flag)
+                del buffer # release export of mapped memory before closing
+        return image_cv
     
     
     def open_image_pillow(self, path_image: str) -> Image:
@@ -175,7 +507,8 @@ class ImageConverter:
     
     
     def convert_image_pillow_to_opencv(self, pil_image: Image) -> cv2.typing.MatLike:
-        """converts image from pillow into openCV format
+        """converts image from pillow into openCV format. 
+        Grayscale, palette and RGBA images are normalized to 3 channels.
 
         Args:
             pil_image (Image): image in pillow format
@@ -183,7 +516,9 @@ class ImageConverter:
         Returns:
             cv2.typing.MatLike: image in openCV format
         """
-        return cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+        if pil_image.mode != "RGB":
+            pil_image = pil_image.convert("RGB")
+        return cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
     
     
     def convert_image_opencv_to_pillow(self, cv_image:cv2.typing.MatLike) -> Image:
@@ -1,7 +1,12 @@
 """Module for logging detection results in logs folder."""
 
 from datetime import datetime
+import gzip
 import os
+import queue
+import shutil
+import threading
+import time
 from modificators_csv import CSVWriter
 
 class Logger:
@@ -9,14 +14,26 @@ class Logger:
     
     This class handles the creation and management of log files, including
     organizing them in a dedicated folder and creating unique filenames
-    for each session.
+    for each session. Optionally, the log is rotated by size and age, so the
+    active file stays small. Rotated segments are compressed and old logs 
+    removed by LogRotator in the background.
     """
     
-    def __init__(self, base_file_path='log.csv')->None:
+    def __init__(self, base_file_path='log.csv', max_segment_mb: float = 0,
+                 max_segment_seconds: float = 0, compress: bool = True,
+                 max_total_mb: float = 0)->None:
         """Initialize CSV writer with unique file path.
 
         Args:
             base_file_path (str, optional): Base path for CSV-log. Defaults to 'log.csv'.
+            max_segment_mb (float, optional): Size of active log, at which it is 
+                rotated. Defaults to 0, no rotation by size.
+            max_segment_seconds (float, optional): Age of active log, at which it 
+                is rotated. Defaults to 0, no rotation by age.
+            compress (bool, optional): Compress rotated segments with gzip. 
+                Defaults to True.
+            max_total_mb (float, optional): Total size of all logs, above which 
+                oldest logs are removed. Defaults to 0, no limit.
         """
         # Create logs folder in current directory
         self.log_dir = os.path.join(os.getcwd(), 'logs')
@@ -27,6 +44,16 @@ class Logger:
         self.file_path = self._create_unique_filename(os.path.join(self.log_dir, base_name))
         self.csv_writer = CSVWriter(self.file_path)
         self.current_image = None
+        
+        self.max_segment_bytes = int(max_segment_mb*1024*1024)
+        self.max_segment_seconds = max_segment_seconds
+        self.segment_count = 0
+        self._segment_start = time.monotonic()
+        self.rotator = None
+        if self.max_segment_bytes > 0 or self.max_segment_seconds > 0 or max_total_mb > 0:
+            name, ext = os.path.splitext(base_name)
+            self.rotator = LogRotator(self.log_dir, name, ext, self.file_path,
+                                      compress, max_total_mb)
 
 
     def _create_unique_filename(self, base_file_path: str) -> str:
@@ -66,8 +93,178 @@ class Logger:
             
         entry_creator = LogEntryCreator(pattern, color, **kwargs)
         entry_data = entry_creator.to_dict()
+        self._rotate_if_due()
         self.csv_writer.write_entry(entry_data)
 
+    def log_shapes(self, shapes: list, frame=None, track_id: bool = False) -> None:
+        """Log entries of all recognized shapes of one image at once.
+        All entries share one timestamp and are written with one file access.
+        Entries always have the same columns, so one log can hold runs with
+        and without tracking.
+
+        Args:
+            shapes (list): Recognized shapes with pattern, color and confidence
+            frame (optional): Frame number. Defaults to None.
+            track_id (bool, optional): Log track id of shapes, empty otherwise.
+                Defaults to False.
+        """
+        if not shapes:
+            return
+        timestamp = TimestampGenerator.get_timestamp()
+        entries = []
+        for shape in shapes:
+            entry_data = {
+                'Timestamp': timestamp,
+                'Pattern': shape.pattern or 'Unknown',
+                'Color': shape.color or 'Unknown',
+                'frame': frame,
+                'confidence': shape.confidence,
+                'track_id': shape.track_id if track_id else '',
+                'image': self.current_image or ''
+            }
+            entries.append(entry_data)
+        self._rotate_if_due()
+        self.csv_writer.write_entries(entries)
+
+    def wait_for_rotation(self, timeout: float = 5.0) -> None:
+        """Wait until rotated segments are compressed and old logs removed.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds. 
+                Defaults to 5.0.
+        """
+        if self.rotator:
+            self.rotator.wait(timeout)
+
+    def _rotate_if_due(self) -> None:
+        """Rotate active log, if it exceeds maximum size or age.
+        The active log is renamed to a numbered segment and a new log with
+        header is started at the same path.
+        """
+        if self.max_segment_bytes <= 0 and self.max_segment_seconds <= 0:
+            return
+        if not os.path.isfile(self.file_path):
+            self._segment_start = time.monotonic()
+            return
+        
+        too_old = (self.max_segment_seconds > 0 and 
+                   time.monotonic() - self._segment_start >= self.max_segment_seconds)
+        too_big = (self.max_segment_bytes > 0 and 
+                   os.path.getsize(self.file_path) >= self.max_segment_bytes)
+        if not (too_old or too_big):
+            return
+        
+        self.segment_count += 1
+        name, ext = os.path.splitext(self.file_path)
+        path_segment = f"{name}_{self.segment_count:04d}{ext}"
+        try:
+            os.replace(self.file_path, path_segment)
+        except OSError as e:
+            print(f"ERROR: Cannot rotate log: \n{e}")
+            return
+        self.csv_writer = CSVWriter(self.file_path)
+        self._segment_start = time.monotonic()
+        self.rotator.add_segment(path_segment)
+
+
+class LogRotator:
+    """Compresses rotated log segments and keeps the total size of logs 
+    below the limit. The work is done in a background thread, so logging 
+    does not wait for it.
+    """
+    
+    def __init__(self, log_dir: str, name: str, ext: str, path_active: str,
+                 compress: bool = True, max_total_mb: float = 0) -> None:
+        """Initialize log rotator and start background thread.
+
+        Args:
+            log_dir (str): Folder of logs
+            name (str): Base name of logs, e.g. 'log'
+            ext (str): Extension of logs, e.g. '.csv'
+            path_active (str): Path of active log, which is never removed
+            compress (bool, optional): Compress segments with gzip. 
+                Defaults to True.
+            max_total_mb (float, optional): Total size of logs, above which 
+                oldest logs are removed. Defaults to 0, no limit.
+        """
+        self.log_dir = log_dir
+        self.name = name
+        self.ext = ext
+        self.path_active = path_active
+        self.compress = compress
+        self.max_total_bytes = int(max_total_mb*1024*1024)
+        self._segments = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True, 
+                                        name="log_rotator")
+        self._thread.start()
+        if self.max_total_bytes > 0:
+            self._segments.put(None) # apply retention to logs of earlier sessions
+
+    def add_segment(self, path_segment: str) -> None:
+        """Pass rotated segment to background thread.
+
+        Args:
+            path_segment (str): Path of rotated segment
+        """
+        self._segments.put(path_segment)
+
+    def wait(self, timeout: float = 5.0) -> None:
+        """Wait until all passed segments are processed.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds. 
+                Defaults to 5.0.
+        """
+        end = time.monotonic() + timeout
+        while self._segments.unfinished_tasks and time.monotonic() < end:
+            time.sleep(0.01)
+
+    def _run(self) -> None:
+        """Compress segments and remove oldest logs, until stopped."""
+        while True:
+            path_segment = self._segments.get()
+            try:
+                if path_segment and self.compress:
+                    self._compress(path_segment)
+                if self.max_total_bytes > 0:
+                    self._apply_retention()
+            except OSError as e:
+                print(f"ERROR: Cannot rotate log: \n{e}")
+            finally:
+                self._segments.task_done()
+
+    def _compress(self, path_segment: str) -> None:
+        """Compress segment with gzip and remove uncompressed segment.
+
+        Args:
+            path_segment (str): Path of rotated segment
+        """
+        path_temp = path_segment + ".gz.tmp"
+        with open(path_segment, 'rb') as file_in, gzip.open(path_temp, 'wb') as file_out:
+            shutil.copyfileobj(file_in, file_out)
+        os.replace(path_temp, path_segment + ".gz")
+        os.remove(path_segment)
+
+    def _apply_retention(self) -> None:
+        """Remove oldest logs, until total size of logs is below limit."""
+        logs = []
+        with os.scandir(self.log_dir) as entries:
+            for entry in entries:
+                if (entry.is_file() and entry.name.startswith(self.name + "_") and
+                    entry.name.endswith((self.ext, self.ext + ".gz"))):
+                    stat = entry.stat()
+                    logs.append((stat.st_mtime, entry.path, stat.st_size))
+        logs.sort()
+        
+        total_bytes = sum(size for _, _, size in logs)
+        for _, path_log, size in logs:
+            if total_bytes <= self.max_total_bytes:
+                break
+            if os.path.abspath(path_log) == os.path.abspath(self.path_active):
+                continue
+            os.remove(path_log)
+            total_bytes -= size
+
 
 class TimestampGenerator:
     """Utility class for generating timestamps."""
@@ -21,14 +21,27 @@ class CSVWriter:
         Raises:
             PermissionError: permission to write file
         """
+        self.write_entries([data])
+
+    def write_entries(self, entries: list) -> None:
+        """Write several log entries to CSV file with one file access.
+
+        Args:
+            entries (list): data as list of dicts
+
+        Raises:
+            PermissionError: permission to write file
+        """
+        if not entries:
+            return
         if self.fieldnames is None:
-            self.fieldnames = list(data.keys())
+            self.fieldnames = list(entries[0].keys())
             self._ensure_file_exists()
 
         if WritePermissionChecker.can_write(self.file_path):
             with open(self.file_path, mode='a', newline='', encoding='utf-8') as csvfile:
                 writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames)
-                writer.writerow(data)
+                writer.writerows(entries)
         else:
             raise PermissionError(f"No write permission for file: {self.file_path}")
 
@@ -1,5 +1,10 @@
 import cv2
+import numpy as np
 from abc import abstractmethod
+from typing import List
+
+from detection_color import get_bgr_colors
+from detection_shape import DetectedShape, TextPlacer
 
 class PictureModifications:
     """Functions to modify an image."""
@@ -18,4 +23,68 @@ class PictureModifications:
         height = int(img.shape[0] * scale / 100)
 
         resized_img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
-        return resized_img
\ No newline at end of file
+        return resized_img
+
+    @staticmethod
+    def resize_to_max_size(img:cv2.typing.MatLike,
+                           max_size:int) -> cv2.typing.MatLike:
+        """Scaling the picture down, so the longer side does not exceed max size
+
+        Args:
+            img (cv2.typing.MatLike): Original image
+            max_size (int): Maximum length of longer side. 0 for no limit.
+
+        Returns:
+            cv2.typing.MatLike: Resized image. Original image, if small enough.
+        """
+        height, width = img.shape[:2]
+        if max_size <= 0 or max(height, width) <= max_size:
+            return img
+        scale = max_size / max(height, width)
+        return cv2.resize(img, (max(1, int(width*scale)), max(1, int(height*scale))),
+                          interpolation=cv2.INTER_AREA)
+
+
+class AnnotationRenderer:
+    """Functions to draw recognized shapes onto an image."""
+    @staticmethod
+    def render(img:cv2.typing.MatLike, recognized:List[DetectedShape],
+               max_size:int=0) -> cv2.typing.MatLike:
+        """Draws contours and names of recognized shapes onto a copy of image.
+        Image is scaled down to max size first, so drawing costs depend on
+        output resolution only.
+
+        Args:
+            img (cv2.typing.MatLike): Image with shapes
+            recognized (List[DetectedShape]): Recognized shapes in image
+                                              coordinates
+            max_size (int, optional): Maximum length of longer side of
+                                      annotated image. Defaults to 0, no limit.
+
+        Returns:
+            cv2.typing.MatLike: Annotated image
+        """
+        annotated_img = PictureModifications.resize_to_max_size(img, max_size)
+        if annotated_img is img:
+            annotated_img = img.copy()
+        scale = annotated_img.shape[1] / img.shape[1]
+
+        contours = []
+        for shape in recognized:
+            contour = shape.contour
+            if contour is None: # e.g. cached results, draw bounding box
+                x, y, w, h = shape.bbox
+                contour = np.array([[[x, y]], [[x+w, y]], [[x+w, y+h]], [[x, y+h]]])
+            if scale != 1:
+                contour = (contour*scale).astype(np.int32)
+            contours.append(contour)
+        if contours:
+            cv2.drawContours(annotated_img, contours, -1, get_bgr_colors()["CYAN"],
+                             max(1, int(5*scale)))
+
+        for shape in recognized:
+            text = f"{shape.pattern}, {shape.color}"
+            coords_text = (int(shape.center[0]*scale),
+                           int(shape.center[1]*scale))
+            TextPlacer.place_text(annotated_img, text, coords_text)
+        return annotated_img
@@ -0,0 +1,270 @@
+"""Module for running processing stages concurrently, connected by bounded queues."""
+
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+POLICY_BLOCK = "block"
+POLICY_DROP = "drop"
+_STOP = object() # signals workers to finish
+
+
+class PipelineStage:
+    """Stage of a pipeline.
+
+    Worker threads take tasks from the bounded input queue, process them and
+    pass the results to the next stage. If the input queue is full, new tasks
+    either wait for free space (block) or are dropped (drop). Results of an
+    ordered stage are passed on in order of the input queue, also with 
+    several workers.
+    """
+    def __init__(self, name:str, process:Callable[[Any], Optional[Any]],
+                 workers:int=1, queue_size:int=4, policy:str=POLICY_BLOCK,
+                 stop_event:Optional[threading.Event]=None,
+                 process_when_stopping:bool=False, ordered:bool=False) -> None:
+        """Initialize pipeline stage
+
+        Args:
+            name (str): name of stage
+            process (Callable[[Any], Optional[Any]]): function processing a task.
+                                Returns task for next stage, None to end task.
+            workers (int, optional): number of worker threads. Defaults to 1.
+            queue_size (int, optional): size of input queue. Defaults to 4.
+            policy (str, optional): "block" or "drop", if input queue is full.
+                                Defaults to "block".
+            stop_event (Optional[threading.Event], optional): Event to stop
+                                processing. Defaults to None.
+            process_when_stopping (bool, optional): keep processing queued
+                                tasks after stop. Defaults to False.
+            ordered (bool, optional): pass results on in order of input.
+                                Defaults to False.
+        """
+        self.name = name
+        self.process = process
+        self.workers = max(1, workers)
+        self.policy = policy if policy in (POLICY_BLOCK, POLICY_DROP) else POLICY_BLOCK
+        self.stop_event = stop_event or threading.Event()
+        self.process_when_stopping = process_when_stopping
+        self.ordered = ordered
+        self.next_stage: Optional["PipelineStage"] = None
+
+        self.input_queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.processed = 0
+        self.dropped = 0
+        self._threads: List[threading.Thread] = []
+        self._finished_workers = 0
+        self._lock = threading.Lock()
+        self._take_lock = threading.Lock() # numbers tasks in order of input
+        self._order_lock = threading.Lock()
+        self._next_taken = 0
+        self._next_passed = 0
+        self._results: Dict[int, Optional[Any]] = {} # finished out of order
+
+
+    def start(self) -> None:
+        """starts worker threads."""
+        self._finished_workers = 0
+        self._next_taken = 0
+        self._next_passed = 0
+        self._results = {}
+        self._threads = [threading.Thread(target=self._run, daemon=True,
+                                          name=f"{self.name}_{id_worker}")
+                         for id_worker in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+
+    def put(self, task:Any) -> bool:
+        """passes task to stage.
+
+        Args:
+            task (Any): task to process
+
+        Returns:
+            bool: True, if queued. False, if dropped.
+        """
+        if self.policy == POLICY_DROP:
+            try:
+                self.input_queue.put_nowait(task)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                return False
+            return True
+        self.input_queue.put(task)
+        return True
+
+
+    def finish(self) -> None:
+        """lets workers finish after all queued tasks.
+        Next stage finishes, when the last worker finished.
+        """
+        for _ in range(self.workers):
+            self.input_queue.put(_STOP)
+
+
+    def join(self, timeout:Optional[float]=None) -> None:
+        """waits for workers to finish.
+
+        Args:
+            timeout (Optional[float], optional): maximum time to wait per
+                                                 worker in seconds.
+                                                 Defaults to None.
+        """
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+    def _run(self) -> None:
+        """takes tasks from input queue and processes them until finished."""
+        while True:
+            with self._take_lock:
+                task = self.input_queue.get()
+                sequence = self._next_taken
+                if task is not _STOP:
+                    self._next_taken += 1
+            if task is _STOP:
+                with self._lock:
+                    self._finished_workers += 1
+                    last_worker = self._finished_workers == self.workers
+                if last_worker and self.next_stage:
+                    self.next_stage.finish()
+                return
+
+            result = None
+            if not self.stop_event.is_set() or self.process_when_stopping:
+                try:
+                    result = self.process(task)
+                    with self._lock:
+                        self.processed += 1
+                except Exception as e:
+                    print(f"Error in pipeline stage {self.name}: {e}")
+            # discarded and failed tasks pass None, so no number is missing
+            self._pass_on(sequence, result)
+
+
+    def _pass_on(self, sequence:int, result:Optional[Any]) -> None:
+        """passes result to next stage. Results of ordered stages wait for
+        the results of all earlier tasks.
+
+        Args:
+            sequence (int): number of task in order of input
+            result (Optional[Any]): result of task. None, if task ended.
+        """
+        if not self.ordered:
+            if result is not None and self.next_stage:
+                self.next_stage.put(result)
+            return
+        with self._order_lock:
+            self._results[sequence] = result
+            while self._next_passed in self._results:
+                result = self._results.pop(self._next_passed)
+                self._next_passed += 1
+                if result is not None and self.next_stage:
+                    self.next_stage.put(result)
+
+
+
+class Pipeline:
+    """Chain of pipeline stages. Tasks pass all stages in order of adding."""
+    def __init__(self, stop_event:Optional[threading.Event]=None) -> None:
+        """Initialize pipeline
+
+        Args:
+            stop_event (Optional[threading.Event], optional): Event to stop
+                                                 processing. Defaults to None.
+        """
+        self.stop_event = stop_event or threading.Event()
+        self.stages: List[PipelineStage] = []
+
+
+    def add_stage(self, name:str, process:Callable[[Any], Optional[Any]],
+                  workers:int=1, queue_size:int=4, policy:str=POLICY_BLOCK,
+                  process_when_stopping:bool=False,
+                  ordered:bool=False) -> PipelineStage:
+        """adds stage at end of pipeline.
+
+        Args:
+            name (str): name of stage
+            process (Callable[[Any], Optional[Any]]): function processing a task
+            workers (int, optional): number of worker threads. Defaults to 1.
+            queue_size (int, optional): size of input queue. Defaults to 4.
+            policy (str, optional): "block" or "drop". Defaults to "block".
+            process_when_stopping (bool, optional): keep processing queued
+                                tasks after stop. Defaults to False.
+            ordered (bool, optional): pass results on in order of input.
+                                Defaults to False.
+
+        Returns:
+            PipelineStage: added stage
+        """
+        stage = PipelineStage(name, process, workers, queue_size, policy,
+                              self.stop_event, process_when_stopping, ordered)
+        if self.stages:
+            self.stages[-1].next_stage = stage
+        self.stages.append(stage)
+        return stage
+
+
+    def start(self) -> None:
+        """starts all stages."""
+        for stage in self.stages:
+            stage.start()
+
+
+    def put(self, task:Any) -> bool:
+        """passes task to first stage.
+
+        Args:
+            task (Any): task to process
+
+        Returns:
+            bool: True, if queued. False, if dropped.
+        """
+        return self.stages[0].put(task)
+
+
+    def finish(self) -> None:
+        """finishes all stages after all queued tasks."""
+        if self.stages:
+            self.stages[0].finish()
+
+
+    def join(self, timeout:Optional[float]=None) -> None:
+        """waits for all stages to finish.
+
+        Args:
+            timeout (Optional[float], optional): maximum time to wait per
+                                                 worker in seconds.
+                                                 Defaults to None.
+        """
+        for stage in self.stages:
+            stage.join(timeout)
+
+
+    def get_statistics(self) -> Dict[str, Dict[str, int]]:
+        """get number of processed and dropped tasks per stage.
+
+        Returns:
+            Dict[str, Dict[str, int]]: statistics by name of stage
+        """
+        return {stage.name: {'processed': stage.processed,
+                             'dropped': stage.dropped}
+                for stage in self.stages}
+
+
+
+if __name__ == "__main__":
+    """Testing of pipeline"""
+    import time
+    pipeline = Pipeline()
+    pipeline.add_stage("square", lambda x: time.sleep(0.02*(x % 3)) or x*x,
+                       workers=3, ordered=True)
+    pipeline.add_stage("print", print)
+    pipeline.start()
+    for number in range(10):
+        pipeline.put(number)
+        time.sleep(0.01)
+    pipeline.finish()
+    pipeline.join()
+    print(pipeline.get_statistics())
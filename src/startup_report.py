@@ -0,0 +1,102 @@
+"""Module for measuring the startup time of the application."""
+
+import sys
+import time
+import importlib
+import threading
+from types import ModuleType
+from typing import List, Tuple
+
+
+class StartupReport:
+    """Times of startup steps and imports of heavy modules since start.
+
+    Heavy modules (NumPy, OpenCV, PIL, detection) are imported on first
+    use, so their imports are timed separately and show, whether they
+    still delay the window. The report is printed only, if enabled.
+    """
+    enabled = False
+    _time_start = time.perf_counter()
+    _steps: List[Tuple[str, float, float]] = [] # name, end since start and duration in ms
+    _lock = threading.Lock()
+
+    @staticmethod
+    def start(enabled:bool=True) -> None:
+        """starts measuring, removes previous steps.
+
+        Args:
+            enabled (bool, optional): True, if report is printed.
+                                      Defaults to True.
+        """
+        with StartupReport._lock:
+            StartupReport.enabled = enabled
+            StartupReport._time_start = time.perf_counter()
+            StartupReport._steps = []
+
+
+    @staticmethod
+    def mark(step:str, duration_ms:float=0.0) -> None:
+        """records end of startup step.
+
+        Args:
+            step (str): name of step
+            duration_ms (float, optional): duration of step in ms.
+                                           Defaults to 0.0, not measured.
+        """
+        time_ms = (time.perf_counter() - StartupReport._time_start) * 1000
+        with StartupReport._lock:
+            StartupReport._steps.append((step, time_ms, duration_ms))
+
+
+    @staticmethod
+    def import_module(name:str) -> ModuleType:
+        """imports module and records duration of first import.
+
+        Args:
+            name (str): name of module
+
+        Returns:
+            ModuleType: imported module
+        """
+        imported = name in sys.modules # maybe still importing in other thread
+        time_start = time.perf_counter()
+        module = importlib.import_module(name)
+        if not imported:
+            StartupReport.mark(f"import {name}",
+                               (time.perf_counter() - time_start) * 1000)
+        return module
+
+
+    @staticmethod
+    def get_report() -> str:
+        """get report of recorded steps.
+
+        Returns:
+            str: one line per step
+        """
+        with StartupReport._lock:
+            steps = list(StartupReport._steps)
+        lines = ["Startup report (ms since start):"]
+        for step, time_ms, duration_ms in steps:
+            line = f"  {time_ms:8.1f}  {step}"
+            if duration_ms:
+                line += f" ({duration_ms:.1f} ms)"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+    @staticmethod
+    def print_report() -> None:
+        """prints report, if enabled."""
+        if StartupReport.enabled:
+            print(StartupReport.get_report())
+
+
+
+if __name__ == "__main__":
+    """Import times of heavy modules"""
+    StartupReport.start()
+    for name in ("numpy", "cv2", "PIL.ImageTk", "controller"):
+        StartupReport.import_module(name)
+    StartupReport.mark("imports done")
+    StartupReport.print_report()